@@ -0,0 +1,249 @@
+import ast
+from typing import Optional, List, Dict, Set
+from pydantic import BaseModel
+
+from .config import (
+    DISALLOWED_IMPORTS,
+    DISALLOWED_CALLS,
+    MAX_SCENE_SECONDS,
+    MAX_LOOP_ITERATIONS,
+    MAX_SCENE_OBJECTS,
+    UNKNOWN_LOOP_ITERATIONS,
+    COST_STARTUP_SECONDS,
+    COST_FRAME_SECONDS,
+    COST_TEX_SECONDS,
+    COST_TEXT_SECONDS,
+    RENDER_TIMEOUT,
+    RENDER_TIMEOUT_FACTOR,
+    RENDER_TIMEOUT_MIN,
+    RENDER_TIMEOUT_MAX
+)
+from .utils import extract_scene_names
+
+
+# Frame rate and pixel count relative to 480p for each manim quality flag
+QUALITY_FRAME_COST = {
+    "l": (15, 1.0),
+    "m": (30, 2.25),
+    "h": (60, 9.0),
+    "p": (60, 16.0),
+    "k": (60, 36.0),
+}
+TEX_CLASSES = {"MathTex", "Tex", "SingleStringMathTex", "Title", "BulletedList"}
+TEXT_CLASSES = {"Text", "MarkupText", "Paragraph"}
+
+
+class SceneAnalysis(BaseModel):
+    """What a static pass over the code predicts about rendering it."""
+    scene_names: List[str] = []
+    run_time_seconds: float = 0.0 # total play() run_time plus wait() durations
+    animations: int = 0
+    objects: int = 0 # mobjects and animations constructed
+    tex_count: int = 0 # LaTeX compilations, before the Tex cache
+    text_count: int = 0
+    loop_iterations: int = 0 # largest nested loop iteration count
+    unbounded_loops: int = 0 # loops whose length isn't known statically
+    helper_calls: int = 0 # calls to methods defined in the code, which aren't followed
+    estimated_seconds: float = 0.0
+    problems: List[str] = []
+
+    def timeout(self) -> float:
+        """Render timeout with headroom over the estimate.
+
+        When loops of unknown length or helper methods leave the estimate
+        unreliable, it never drops below the fixed RENDER_TIMEOUT per scene.
+        """
+        timeout = min(RENDER_TIMEOUT_MAX, max(RENDER_TIMEOUT_MIN, self.estimated_seconds * RENDER_TIMEOUT_FACTOR))
+        if self.unbounded_loops or self.helper_calls:
+            timeout = max(timeout, RENDER_TIMEOUT * max(1, len(self.scene_names)))
+        return timeout
+
+
+def _call_name(node: ast.Call) -> str:
+    if isinstance(node.func, ast.Attribute):
+        return node.func.attr
+    return node.func.id if isinstance(node.func, ast.Name) else ""
+
+
+def _number(node: Optional[ast.expr], default: float) -> float:
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        return float(node.value)
+    return default
+
+
+def _keyword(node: ast.Call, name: str) -> Optional[ast.expr]:
+    return next((keyword.value for keyword in node.keywords if keyword.arg == name), None)
+
+
+def _iterations(node: ast.expr) -> Optional[int]:
+    """Length of a for-loop iterable when it is a literal or range() of constants."""
+    if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+        return len(node.elts)
+    if isinstance(node, ast.Call) and _call_name(node) == "range" and node.args:
+        bounds = [_number(arg, None) for arg in node.args]
+        if None in bounds:
+            return None
+        start, stop, step = (0.0, bounds[0], 1.0) if len(bounds) == 1 else (*bounds[:2], bounds[2] if len(bounds) > 2 else 1.0)
+        return max(0, int((stop - start) / step)) if step else None
+    return None
+
+
+class _Estimator:
+    """Walks construct() once, weighting everything inside a loop by its iteration count."""
+
+    def __init__(self, analysis: SceneAnalysis, helpers: Set[str]):
+        self.analysis = analysis
+        self.helpers = helpers
+
+    def loop(self, iterations: Optional[int], multiplier: int) -> int:
+        if iterations is None:
+            self.analysis.unbounded_loops += 1
+            iterations = UNKNOWN_LOOP_ITERATIONS
+        total = multiplier * iterations
+        self.analysis.loop_iterations = max(self.analysis.loop_iterations, total)
+        return total
+
+    def statements(self, body: List[ast.stmt], multiplier: int) -> None:
+        for node in body:
+            if isinstance(node, (ast.For, ast.AsyncFor)):
+                self.expression(node.iter, multiplier)
+                self.statements(node.body, self.loop(_iterations(node.iter), multiplier))
+                self.statements(node.orelse, multiplier)
+            elif isinstance(node, ast.While):
+                self.expression(node.test, multiplier)
+                self.statements(node.body, self.loop(None, multiplier))
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                continue  # only counted where it is called from construct()
+            else:
+                for child in ast.iter_child_nodes(node):
+                    if isinstance(child, ast.stmt):
+                        self.statements([child], multiplier)
+                    else:
+                        self.expression(child, multiplier)
+
+    def expression(self, node: ast.AST, multiplier: int) -> None:
+        if isinstance(node, (ast.ListComp, ast.SetComp, ast.GeneratorExp, ast.DictComp)):
+            inner = multiplier
+            for generator in node.generators:
+                self.expression(generator.iter, inner)
+                inner = self.loop(_iterations(generator.iter), inner)
+            for part in (getattr(node, "elt", None), getattr(node, "key", None), getattr(node, "value", None)):
+                if part is not None:
+                    self.expression(part, inner)
+            return
+
+        if isinstance(node, ast.Call):
+            self.call(node, multiplier)
+
+        for child in ast.iter_child_nodes(node):
+            self.expression(child, multiplier)
+
+    def call(self, node: ast.Call, multiplier: int) -> None:
+        name = _call_name(node)
+        analysis = self.analysis
+        if (isinstance(node.func, ast.Attribute) and isinstance(node.func.value, ast.Name)
+                and node.func.value.id == "self" and name in self.helpers):
+            analysis.helper_calls += multiplier
+        if name == "play":
+            analysis.animations += multiplier
+            analysis.run_time_seconds += multiplier * _number(_keyword(node, "run_time"), 1.0)
+        elif name == "wait":
+            duration = node.args[0] if node.args else _keyword(node, "duration")
+            analysis.animations += multiplier
+            analysis.run_time_seconds += multiplier * _number(duration, 1.0)
+        elif name in TEX_CLASSES:
+            analysis.tex_count += multiplier
+        elif name in TEXT_CLASSES:
+            analysis.text_count += multiplier
+        if name[:1].isupper():
+            analysis.objects += multiplier
+
+
+def _check_safety(tree: ast.Module, problems: List[str]) -> None:
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            modules = [node.module or ""]
+        else:
+            modules = []
+        for module in modules:
+            if module.split(".")[0] in DISALLOWED_IMPORTS:
+                problems.append(f"Import of {module} is not allowed")
+
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in DISALLOWED_CALLS:
+            problems.append(f"Call to {node.func.id}() is not allowed (line {node.lineno})")
+
+
+def estimate_seconds(analysis: SceneAnalysis, quality: str) -> float:
+    """Rough render cost: frames scaled by resolution and scene size, plus LaTeX and text layout."""
+    frame_rate, pixel_factor = QUALITY_FRAME_COST.get(quality, QUALITY_FRAME_COST["l"])
+    frames = analysis.run_time_seconds * frame_rate
+    frame_cost = COST_FRAME_SECONDS * pixel_factor * (1 + analysis.objects / 200)
+    return (
+        COST_STARTUP_SECONDS
+        + frames * frame_cost
+        + analysis.tex_count * COST_TEX_SECONDS
+        + analysis.text_count * COST_TEXT_SECONDS
+    )
+
+
+def analyze_code(code: str, scene_names: Optional[List[str]], quality: str) -> SceneAnalysis:
+    """Estimate the cost of rendering the given scenes and flag problems.
+
+    Without scene names only the first scene counts, as that is the one a
+    task without a scene name renders.
+
+    Loops of unknown length count as UNKNOWN_LOOP_ITERATIONS and helper
+    methods are not followed, so this is an estimate for scheduling and
+    timeouts rather than a bound.
+    """
+    analysis = SceneAnalysis()
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        analysis.problems.append(f"Syntax error in provided code: {str(e)} (line {e.lineno})")
+        return analysis
+
+    _check_safety(tree, analysis.problems)
+
+    available = extract_scene_names(code)
+    if not available:
+        analysis.problems.append("Code defines no Scene class")
+        return analysis
+
+    missing = [name for name in scene_names or [] if name not in available]
+    if missing:
+        analysis.problems.append(f"Scenes not found: {', '.join(missing)}")
+    analysis.scene_names = [name for name in scene_names if name in available] if scene_names else available[:1]
+
+    classes: Dict[str, ast.ClassDef] = {node.name: node for node in tree.body if isinstance(node, ast.ClassDef)}
+    helpers = {
+        node.name for cls in classes.values() for node in cls.body
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name != "construct"
+    }
+    estimator = _Estimator(analysis, helpers)
+    for scene_name in analysis.scene_names:
+        construct = next(
+            (node for node in classes[scene_name].body
+             if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name == "construct"),
+            None
+        )
+        if construct:
+            estimator.statements(construct.body, 1)
+
+    if analysis.run_time_seconds > MAX_SCENE_SECONDS:
+        analysis.problems.append(
+            f"Scenes run for {analysis.run_time_seconds:.0f}s, over the {MAX_SCENE_SECONDS}s limit"
+        )
+    if analysis.loop_iterations > MAX_LOOP_ITERATIONS:
+        analysis.problems.append(
+            f"Loops run {analysis.loop_iterations} iterations, over the {MAX_LOOP_ITERATIONS} limit"
+        )
+    if analysis.objects > MAX_SCENE_OBJECTS:
+        analysis.problems.append(
+            f"Scenes construct about {analysis.objects} objects, over the {MAX_SCENE_OBJECTS} limit"
+        )
+
+    analysis.estimated_seconds = estimate_seconds(analysis, quality)
+    return analysis
@@ -7,22 +7,191 @@ AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
 AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
 AWS_REGION = os.getenv("AWS_REGION")
 AWS_S3_BUCKET_NAME = os.getenv("AWS_S3_BUCKET_NAME")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")  # e.g. a local moto/MinIO server
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", 32))
+S3_MULTIPART_THRESHOLD_MB = int(os.getenv("S3_MULTIPART_THRESHOLD_MB", 8))
+S3_MULTIPART_CHUNKSIZE_MB = int(os.getenv("S3_MULTIPART_CHUNKSIZE_MB", 8))
+S3_MAX_CONCURRENCY = int(os.getenv("S3_MAX_CONCURRENCY", 8))
+S3_STREAM_UPLOAD = os.getenv("S3_STREAM_UPLOAD", "false").lower() == "true"
+
+# Where results go: "s3", or "local" for ARTIFACT_DIR served by the API at /media
+ARTIFACT_STORE = os.getenv("ARTIFACT_STORE", "s3")
+PREVIEW_ARTIFACT_STORE = os.getenv("PREVIEW_ARTIFACT_STORE", ARTIFACT_STORE)
+ARTIFACT_DIR = os.path.abspath(os.getenv("ARTIFACT_DIR", os.path.join("media", "artifacts")))  # shared with the API
+ARTIFACT_BASE_URL = os.getenv("ARTIFACT_BASE_URL", "http://localhost:8000")  # public URL of the API
+ARTIFACT_TTL = int(os.getenv("ARTIFACT_TTL", 7 * 24 * 3600))
+ARTIFACT_MAX_AGE = int(os.getenv("ARTIFACT_MAX_AGE", 365 * 24 * 3600))  # Cache-Control for served artifacts
 
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 REDIS_DB = int(os.getenv("REDIS_DB", 0))
 REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", None)
+REDIS_POOL_SIZE = int(os.getenv("REDIS_POOL_SIZE", 50))
+REDIS_POOL_TIMEOUT = int(os.getenv("REDIS_POOL_TIMEOUT", 5))
 REDIS_URL = f"redis://{':' + REDIS_PASSWORD + '@' if REDIS_PASSWORD else ''}{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}"
 
-TASK_QUEUE = "manim_tasks"
-RESULT_HASH = "manim_results"
+TASK_QUEUE = "manim_tasks"  # signal list: one token per queued task
+SUBQUEUE_PREFIX = "manim_tasks"  # manim_tasks:<priority>:<tenant>
+TENANT_RING_PREFIX = "manim_tenants"
+TENANT_CREDITS_PREFIX = "manim_tenant_credits"
+TENANT_WEIGHTS = "manim_tenant_weights"
+PENDING_COUNT = "manim_pending"
+DEFAULT_TENANT = "anonymous"
+TASK_KEY_PREFIX = "manim_task"
+CODE_KEY_PREFIX = "manim_code"  # manim_code:<sha256>, shared by tasks with the same source
+TASK_INDEX = "manim_task_index"
 TASK_CHANNEL = "task_updates"
+TASK_TTL = int(os.getenv("TASK_TTL", 7 * 24 * 3600))
+GROUP_KEY_PREFIX = "manim_group"
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", 100))
+
+MAX_QUEUE_DEPTH = int(os.getenv("MAX_QUEUE_DEPTH", 1000))  # 0 disables the cap
+# Token bucket per client address (TENANT_RATE_* are the old names). Behind a
+# proxy or the Next.js route every user shares the proxy's address, so it is
+# off by default; set TRUST_FORWARDED_FOR only behind a proxy that sets it.
+CLIENT_RATE_LIMIT = float(os.getenv("CLIENT_RATE_LIMIT", os.getenv("TENANT_RATE_LIMIT", 0)))  # per minute, 0 disables
+CLIENT_RATE_BURST = int(os.getenv("CLIENT_RATE_BURST", os.getenv("TENANT_RATE_BURST", 20)))
+TRUST_FORWARDED_FOR = os.getenv("TRUST_FORWARDED_FOR", "false").lower() == "true"
+RATE_LIMIT_PREFIX = "manim_rate"
+SERVICE_STATS = "manim_service_stats"
+SERVICE_TIME_ALPHA = float(os.getenv("SERVICE_TIME_ALPHA", 0.1))
+DEFAULT_SERVICE_TIME = float(os.getenv("DEFAULT_SERVICE_TIME", 30))  # until workers report any
+CAPACITY_CACHE_TTL = float(os.getenv("CAPACITY_CACHE_TTL", 2))
+AUTOSCALE_TARGET_WAIT = float(os.getenv("AUTOSCALE_TARGET_WAIT", 60))
+AUTOSCALE_MIN_WORKERS = int(os.getenv("AUTOSCALE_MIN_WORKERS", 1))
+AUTOSCALE_MAX_WORKERS = int(os.getenv("AUTOSCALE_MAX_WORKERS", 100))
+
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", 100))
+EVENT_KEEPALIVE_INTERVAL = int(os.getenv("EVENT_KEEPALIVE_INTERVAL", 15))
+
+RELIABLE_QUEUE = os.getenv("RELIABLE_QUEUE", "false").lower() == "true"
+PROCESSING_QUEUE_PREFIX = "manim_processing"
+WORKER_HEARTBEAT_PREFIX = "manim_worker"
+INFLIGHT_SET = "manim_inflight"
+VISIBILITY_TIMEOUT = int(os.getenv("VISIBILITY_TIMEOUT", 300))
+HEARTBEAT_INTERVAL = int(os.getenv("HEARTBEAT_INTERVAL", 30))
+REAPER_INTERVAL = int(os.getenv("REAPER_INTERVAL", 30))
+MAX_TASK_RETRIES = int(os.getenv("MAX_TASK_RETRIES", 3))
+
+RENDER_QUALITY = os.getenv("RENDER_QUALITY", "l")
+PREVIEW_QUALITY = os.getenv("PREVIEW_QUALITY", "l")
+PREVIEW_LAST_FRAME = os.getenv("PREVIEW_LAST_FRAME", "false").lower() == "true"
+QUALITY_DIRS = {
+    "l": "480p15",
+    "m": "720p30",
+    "h": "1080p60",
+    "p": "1440p60",
+    "k": "2160p60",
+}
+
+# HLS output: segments of about HLS_SEGMENT_SECONDS, encoded with the x264 preset for the
+# task's quality ("copy" keeps manim's encode); e.g. ENCODER_PRESETS=l=superfast,h=medium
+HLS_PREFIX = "hls"
+HLS_SEGMENT_SECONDS = int(os.getenv("HLS_SEGMENT_SECONDS", 4))
+HLS_CRF = int(os.getenv("HLS_CRF", 23))
+ENCODER_PRESETS = {
+    "l": "ultrafast",
+    "m": "veryfast",
+    "h": "fast",
+    "p": "fast",
+    "k": "medium",
+}
+ENCODER_PRESETS.update(
+    item.split("=", 1) for item in os.getenv("ENCODER_PRESETS", "").split(",") if "=" in item
+)
+
+RENDER_CACHE_ENABLED = os.getenv("RENDER_CACHE_ENABLED", "true").lower() == "true"
+RENDER_CACHE_PREFIX = "manim_render_cache"
+RENDER_CACHE_TTL = int(os.getenv("RENDER_CACHE_TTL", 7 * 24 * 3600))
+RENDER_CACHE_MAX_ENTRIES = int(os.getenv("RENDER_CACHE_MAX_ENTRIES", 10000))
+
+PARTIAL_CACHE_ENABLED = os.getenv("PARTIAL_CACHE_ENABLED", "true").lower() == "true"
+PARTIAL_CACHE_DIR = os.path.abspath(os.getenv("PARTIAL_CACHE_DIR", os.path.join("media", "partial_movie_cache")))
+PARTIAL_CACHE_MAX_MB = int(os.getenv("PARTIAL_CACHE_MAX_MB", 5120))
+TEX_CACHE_ENABLED = os.getenv("TEX_CACHE_ENABLED", "true").lower() == "true"
+TEX_CACHE_DIR = os.path.abspath(os.getenv("TEX_CACHE_DIR", os.path.join("media", "tex_cache")))
+TEXT_CACHE_DIR = os.path.abspath(os.getenv("TEXT_CACHE_DIR", os.path.join("media", "text_cache")))
+TEX_CACHE_MAX_MB = int(os.getenv("TEX_CACHE_MAX_MB", 1024))
+TEX_PREWARM_FILE = os.getenv("TEX_PREWARM_FILE")  # formulas to compile at startup, one per line
+MEDIA_CACHE_GC_INTERVAL = int(os.getenv("MEDIA_CACHE_GC_INTERVAL", 300))
+MEDIA_CACHE_MIN_AGE = int(os.getenv("MEDIA_CACHE_MIN_AGE", 600))  # entries used this recently are never pruned
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_PREFIX = "manim_metrics"
 
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:3000")
 WEBHOOK_ENABLED = os.getenv("WEBHOOK_ENABLED", "false").lower() == "true"
 WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_STREAM = "manim_webhooks"
+WEBHOOK_GROUP = "webhook-dispatchers"
+WEBHOOK_RETRY_SET = "manim_webhooks:retry"
+WEBHOOK_DEAD_LETTER = "manim_webhooks:dead"
+WEBHOOK_STREAM_MAXLEN = int(os.getenv("WEBHOOK_STREAM_MAXLEN", 100000))
+WEBHOOK_DEAD_LETTER_MAX = int(os.getenv("WEBHOOK_DEAD_LETTER_MAX", 10000))
+WEBHOOK_TIMEOUT = float(os.getenv("WEBHOOK_TIMEOUT", 10))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", 6))
+WEBHOOK_BACKOFF_BASE = float(os.getenv("WEBHOOK_BACKOFF_BASE", 2))
+WEBHOOK_BACKOFF_MAX = float(os.getenv("WEBHOOK_BACKOFF_MAX", 600))
+WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", 100))
+WEBHOOK_BATCHING = os.getenv("WEBHOOK_BATCHING", "false").lower() == "true"  # POST a JSON array per endpoint
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", 100))
+WEBHOOK_CLAIM_IDLE = int(os.getenv("WEBHOOK_CLAIM_IDLE", 60))  # seconds before another dispatcher takes over
 
 NUM_WORKERS = int(os.getenv("NUM_WORKERS", 2))
+WORKER_BACKOFF_BASE = float(os.getenv("WORKER_BACKOFF_BASE", 0.1))
+WORKER_BACKOFF_MAX = float(os.getenv("WORKER_BACKOFF_MAX", 30))
+
+RENDERER_POOL_ENABLED = os.getenv("RENDERER_POOL_ENABLED", "false").lower() == "true"
+RENDERER_MAX_TASKS = int(os.getenv("RENDERER_MAX_TASKS", 50))
+RENDERER_MAX_RSS_MB = int(os.getenv("RENDERER_MAX_RSS_MB", 1024))
+RENDER_TIMEOUT = int(os.getenv("RENDER_TIMEOUT", 180))
+# Tasks carry a timeout of RENDER_TIMEOUT_FACTOR times their estimated cost; RENDER_TIMEOUT covers the rest
+RENDER_TIMEOUT_FACTOR = float(os.getenv("RENDER_TIMEOUT_FACTOR", 3))
+RENDER_TIMEOUT_MIN = int(os.getenv("RENDER_TIMEOUT_MIN", 60))
+RENDER_TIMEOUT_MAX = int(os.getenv("RENDER_TIMEOUT_MAX", 900))
+
+# Static pre-flight analysis of submitted code
+ANALYSIS_ENABLED = os.getenv("ANALYSIS_ENABLED", "true").lower() == "true"
+DISALLOWED_IMPORTS = set(filter(None, os.getenv(
+    "DISALLOWED_IMPORTS",
+    "os,sys,subprocess,socket,shutil,ctypes,multiprocessing,threading,signal,importlib,pickle,requests,urllib,http"
+).split(",")))
+DISALLOWED_CALLS = set(filter(None, os.getenv("DISALLOWED_CALLS", "eval,exec,compile,__import__,open,input,breakpoint").split(",")))
+MAX_SCENE_SECONDS = float(os.getenv("MAX_SCENE_SECONDS", 600))  # animation time across a task's scenes
+MAX_LOOP_ITERATIONS = int(os.getenv("MAX_LOOP_ITERATIONS", 10000))
+MAX_SCENE_OBJECTS = int(os.getenv("MAX_SCENE_OBJECTS", 20000))
+UNKNOWN_LOOP_ITERATIONS = int(os.getenv("UNKNOWN_LOOP_ITERATIONS", 10))  # assumed for loops of unknown length
+# Cost model: startup, per 480p frame, per LaTeX compile and per Pango text
+COST_STARTUP_SECONDS = float(os.getenv("COST_STARTUP_SECONDS", 3))
+COST_FRAME_SECONDS = float(os.getenv("COST_FRAME_SECONDS", 0.01))
+COST_TEX_SECONDS = float(os.getenv("COST_TEX_SECONDS", 0.5))
+COST_TEXT_SECONDS = float(os.getenv("COST_TEXT_SECONDS", 0.05))
+HEAVY_TASK_SECONDS = float(os.getenv("HEAVY_TASK_SECONDS", 120))  # default-priority tasks above this run as batch
+
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", 0))  # 0 sizes to the CPU count
+RENDER_THREADS = int(os.getenv("RENDER_THREADS", 2))
+RENDER_MEMORY_LIMIT_MB = int(os.getenv("RENDER_MEMORY_LIMIT_MB", 0))  # RLIMIT_DATA per render, 0 disables
+RENDER_CPU_LIMIT = int(os.getenv("RENDER_CPU_LIMIT", 300))
+
+# Split long scenes into animation ranges rendered side by side while the queue is short
+PARALLEL_RENDER_ENABLED = os.getenv("PARALLEL_RENDER_ENABLED", "false").lower() == "true"
+PARALLEL_RENDER_MIN_ANIMATIONS = int(os.getenv("PARALLEL_RENDER_MIN_ANIMATIONS", 8))  # per range
+PARALLEL_RENDER_MAX_SPLITS = int(os.getenv("PARALLEL_RENDER_MAX_SPLITS", 0))  # 0 sizes to the host CPUs
+PARALLEL_RENDER_MAX_PENDING = int(os.getenv("PARALLEL_RENDER_MAX_PENDING", 0))  # queued tasks that still allow a split
+
+# A dedicated directory, removed on API shutdown; e.g. /dev/shm/manim-temp for tmpfs
+TEMP_DIR = os.path.abspath(os.getenv("TEMP_DIR", os.path.join(os.path.dirname(__file__), "temp")))
+MEDIA_DIR = "media"
 
-TEMP_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "temp"))
-MEDIA_DIR = "media"
\ No newline at end of file
+# Per-task workspaces on the first root with room, e.g. WORKSPACE_ROOTS=/dev/shm/manim-workspaces,media/workspaces
+# to stage renders on a tmpfs and fall back to disk
+WORKSPACE_ROOTS = [
+    os.path.abspath(root)
+    for root in os.getenv("WORKSPACE_ROOTS", os.path.join(MEDIA_DIR, "workspaces")).split(",") if root
+]
+WORKSPACE_MIN_FREE_MB = int(os.getenv("WORKSPACE_MIN_FREE_MB", 512))
+WORKSPACE_QUOTA_MB = int(os.getenv("WORKSPACE_QUOTA_MB", 2048))  # per task, 0 disables
+WORKSPACE_MAX_TOTAL_MB = int(os.getenv("WORKSPACE_MAX_TOTAL_MB", 20480))  # per root, 0 disables
+WORKSPACE_MAX_AGE = int(os.getenv("WORKSPACE_MAX_AGE", 900))  # abandoned workspaces are kept this long
+WORKSPACE_GC_MIN_AGE = int(os.getenv("WORKSPACE_GC_MIN_AGE", 60))
+WORKSPACE_GC_INTERVAL = int(os.getenv("WORKSPACE_GC_INTERVAL", 60))
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Set, Any, AsyncIterator
+from redis.asyncio import Redis as AsyncRedis
+
+from .config import (
+    REDIS_HOST,
+    REDIS_PORT,
+    REDIS_DB,
+    REDIS_PASSWORD,
+    TASK_CHANNEL,
+    EVENT_QUEUE_SIZE
+)
+from .serialization import dumps, loads
+
+
+logger = logging.getLogger("manim-events")
+
+
+class TaskEventBroker:
+    """Fans out TASK_CHANNEL messages from one shared subscription to many clients.
+
+    Each client gets its own bounded queue, filtered to a single task or
+    receiving every event when subscribed without a task id. A client that
+    falls behind loses its oldest events rather than stalling the others.
+    """
+
+    def __init__(self):
+        self.subscribers: Dict[Optional[str], Set[asyncio.Queue]] = defaultdict(set)
+        self.redis: Optional[AsyncRedis] = None
+        self.listener: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self.redis = AsyncRedis(
+            host=REDIS_HOST,
+            port=REDIS_PORT,
+            db=REDIS_DB,
+            password=REDIS_PASSWORD,
+            decode_responses=True
+        )
+        self.listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self.listener:
+            self.listener.cancel()
+            try:
+                await self.listener
+            except asyncio.CancelledError:
+                pass
+        if self.redis:
+            await self.redis.aclose()
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(TASK_CHANNEL)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self._dispatch(loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Task event subscription failed, reconnecting: {str(e)}")
+                await asyncio.sleep(1)
+
+    def _dispatch(self, event: Dict[str, Any]) -> None:
+        for subscriber in self.subscribers.get(event.get("task_id"), set()) | self.subscribers.get(None, set()):
+            if subscriber.full():
+                subscriber.get_nowait()
+            subscriber.put_nowait(event)
+
+    @asynccontextmanager
+    async def subscribe(self, task_id: Optional[str] = None) -> AsyncIterator[asyncio.Queue]:
+        """Receive events for one task, or for every task when task_id is None."""
+        subscriber: asyncio.Queue = asyncio.Queue(maxsize=EVENT_QUEUE_SIZE)
+        self.subscribers[task_id].add(subscriber)
+        try:
+            yield subscriber
+        finally:
+            self.subscribers[task_id].discard(subscriber)
+            if not self.subscribers[task_id]:
+                del self.subscribers[task_id]
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    return f"event: {event.get('type', 'message')}\ndata: {dumps(event)}\n\n"
+
+
+broker = TaskEventBroker()
@@ -0,0 +1,144 @@
+import os
+import csv
+import math
+import shutil
+import logging
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Tuple
+
+from .config import (
+    HLS_PREFIX,
+    HLS_SEGMENT_SECONDS,
+    HLS_CRF,
+    ENCODER_PRESETS
+)
+from .metrics import metrics
+from .storage import artifact_store
+
+
+logger = logging.getLogger("manim-hls")
+
+PLAYLIST_FILE = "index.m3u8"
+
+
+class HlsStream:
+    """Publishes a render as an HLS event playlist, a few segments at a time.
+
+    Each added video (a partial movie per animation, or a whole finished
+    render) is cut into MPEG-TS segments of about HLS_SEGMENT_SECONDS,
+    continuing the timestamps of the previous one, stored under
+    hls/<task id>/ in the artifact store, and the playlist is re-uploaded uncached after it, so
+    players can start on the first animation while the rest still renders.
+    Videos are processed in order on one background thread, leaving the
+    render free to go on.
+    """
+
+    def __init__(self, task_id: str, quality: str, work_dir: str, preset: Optional[str] = None):
+        self.task_id = task_id
+        self.prefix = f"{HLS_PREFIX}/{task_id}"
+        self.preset = preset or ENCODER_PRESETS.get(quality, "veryfast")
+        self.work_dir = work_dir
+        self.segments: List[Tuple[str, float]] = []
+        self.videos_added = 0
+        self.error: Optional[str] = None
+        self.playlist_url = artifact_store.url(f"{self.prefix}/{PLAYLIST_FILE}")
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"hls-{task_id}")
+        os.makedirs(self.work_dir, exist_ok=True)
+
+    @property
+    def ready(self) -> bool:
+        """Whether the playlist has been published with at least one segment."""
+        return bool(self.segments)
+
+    def add(self, video_path: str) -> None:
+        self.videos_added += 1
+        self.executor.submit(self._add, video_path)
+
+    def finish(self) -> Tuple[bool, str]:
+        """Wait for pending segments and close the playlist; returns (success, playlist URL or error)."""
+        self.executor.shutdown(wait=True)
+        if self.error:
+            return False, self.error
+        if not self.segments:
+            return False, "Render produced no video to segment"
+        return self._publish(ended=True)
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def _add(self, video_path: str) -> None:
+        if self.error:
+            return
+        try:
+            with metrics.timed("hls_segment", self.task_id):
+                self._segment(video_path)
+        except Exception as e:
+            self.error = f"Failed to segment {os.path.basename(video_path)}: {str(e)}"
+            logger.error(self.error)
+
+    def _segment(self, video_path: str) -> None:
+        index = len(self.segments)
+        stem = os.path.join(self.work_dir, f"{index:05d}")
+        if self.preset == "copy":
+            encode = ["-c:v", "copy"]
+        else:
+            encode = [
+                "-c:v", "libx264",
+                "-preset", self.preset,
+                "-crf", str(HLS_CRF),
+                "-pix_fmt", "yuv420p",
+                "-force_key_frames", f"expr:gte(t,n_forced*{HLS_SEGMENT_SECONDS})"
+            ]
+        offset = sum(duration for _, duration in self.segments)
+
+        result = subprocess.run(
+            ["ffmpeg", "-y", "-loglevel", "error", "-i", video_path, "-an", *encode,
+             "-output_ts_offset", f"{offset:.6f}",
+             "-f", "segment", "-segment_time", str(HLS_SEGMENT_SECONDS), "-segment_format", "mpegts",
+             "-segment_list", f"{stem}.csv", "-segment_list_type", "csv", f"{stem}_%03d.ts"],
+            capture_output=True,
+            text=True
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed: {result.stderr}")
+
+        with open(f"{stem}.csv") as f:
+            for name, start, end in csv.reader(f):
+                success, url_or_error = artifact_store.put(
+                    os.path.join(self.work_dir, name),
+                    key=f"{self.prefix}/{name}",
+                    content_type="video/mp2t"
+                )
+                if not success:
+                    raise RuntimeError(url_or_error)
+                self.segments.append((name, float(end) - float(start)))
+
+        success, url_or_error = self._publish(ended=False)
+        if not success:
+            raise RuntimeError(url_or_error)
+
+    def _publish(self, ended: bool) -> Tuple[bool, str]:
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            "#EXT-X-PLAYLIST-TYPE:EVENT",
+            f"#EXT-X-TARGETDURATION:{math.ceil(max(duration for _, duration in self.segments))}",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+        ]
+        for name, duration in self.segments:
+            lines += [f"#EXTINF:{duration:.3f},", name]
+        if ended:
+            lines.append("#EXT-X-ENDLIST")
+
+        playlist_path = os.path.join(self.work_dir, PLAYLIST_FILE)
+        with open(playlist_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        # Players re-fetch the playlist while it grows, so it mustn't be cached until it ends
+        return artifact_store.put(
+            playlist_path,
+            key=f"{self.prefix}/{PLAYLIST_FILE}",
+            content_type="application/vnd.apple.mpegurl",
+            cache_control="public, max-age=31536000, immutable" if ended else "no-cache"
+        )
@@ -0,0 +1,98 @@
+import os
+import resource
+from typing import List, Optional
+
+from .config import RENDER_THREADS, RENDER_MEMORY_LIMIT_MB, RENDER_CPU_LIMIT, WORKSPACE_QUOTA_MB
+
+
+THREAD_ENV_VARS = [
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+]
+
+
+def available_cpus() -> List[int]:
+    """CPUs this process is allowed to run on."""
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+
+# Captured at import, before a supervised worker process pins itself to its slice
+HOST_CPUS = available_cpus()
+
+
+def host_render_slots() -> int:
+    """Renders of RENDER_THREADS each that fit on the host, whatever slice this process is pinned to."""
+    return max(1, len(HOST_CPUS) // RENDER_THREADS)
+
+
+def default_worker_processes() -> int:
+    """Size the worker pool to the cores and memory available on this box."""
+    count = max(1, len(available_cpus()) // RENDER_THREADS)
+
+    if RENDER_MEMORY_LIMIT_MB:
+        try:
+            total_mb = os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") // (1024 * 1024)
+            count = min(count, max(1, total_mb // RENDER_MEMORY_LIMIT_MB))
+        except (ValueError, OSError):
+            pass
+
+    return count
+
+
+def cpu_slice(index: int) -> List[int]:
+    """CPUs reserved for the worker process in the given slot."""
+    cpus = available_cpus()
+    return [cpus[(index * RENDER_THREADS + i) % len(cpus)] for i in range(RENDER_THREADS)]
+
+
+def pin_render_threads(cpus: Optional[List[int]] = None) -> None:
+    """Cap numpy/BLAS threads and, if given, bind this process to a CPU slice.
+
+    Renderers and the ffmpeg/libav encoders they start inherit both the
+    environment and the affinity mask, and size their own thread pools from it.
+    """
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(RENDER_THREADS)
+
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, set(cpus))
+
+
+def apply_task_limits() -> None:
+    """Apply the per-task memory, CPU-time and file-size rlimits to the current process.
+
+    Called by CLI renders at startup and by pooled renderers before each task.
+    Memory is capped with RLIMIT_DATA rather than RLIMIT_AS, since x264
+    threads, PyAV and glibc arenas reserve far more address space than they
+    use; the cap is off unless RENDER_MEMORY_LIMIT_MB is set. The CPU limit is relative to the time already used, so long-lived
+    renderers get a fresh budget per task. No single file may outgrow the
+    workspace quota, so a runaway render is stopped (SIGXFSZ) before it
+    fills the disk rather than caught by the quota check afterwards.
+    """
+    if RENDER_MEMORY_LIMIT_MB:
+        limit = RENDER_MEMORY_LIMIT_MB * 1024 * 1024
+        _, hard = resource.getrlimit(resource.RLIMIT_DATA)
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_DATA, (limit, hard))
+
+    if RENDER_CPU_LIMIT:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        limit = int(usage.ru_utime + usage.ru_stime) + RENDER_CPU_LIMIT
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_CPU, (limit, hard))
+
+    if WORKSPACE_QUOTA_MB:
+        limit = WORKSPACE_QUOTA_MB * 1024 * 1024
+        _, hard = resource.getrlimit(resource.RLIMIT_FSIZE)
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_FSIZE, (limit, hard))
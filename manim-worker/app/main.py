@@ -1,21 +1,52 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse, FileResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 import os
+import math
+from stat import S_ISREG
 import shutil
+import asyncio
 from contextlib import asynccontextmanager
 
-from .models import ManimCode, TaskResponse, TaskStatusResponse
-from .task_queue import queue
-from .utils import validate_manim_code
-from .config import FRONTEND_URL, TEMP_DIR
+from typing import List, Optional, Tuple
+
+from .models import (
+    ManimCode,
+    BatchRenderRequest,
+    BatchResponse,
+    AutoscaleResponse,
+    GroupStatusResponse,
+    Task,
+    TaskResponse,
+    TaskStatus,
+    TaskStatusResponse
+)
+from .analysis import SceneAnalysis, analyze_code
+from .task_queue import async_queue as queue, estimate_wait, desired_workers
+from .events import broker, format_sse
+from .metrics import collect as collect_metrics
+from .storage import artifact_store, preview_store, LocalStore
+from .utils import validate_manim_code, extract_scene_names
+from .config import (
+    FRONTEND_URL,
+    TEMP_DIR,
+    EVENT_KEEPALIVE_INTERVAL,
+    BATCH_MAX_ITEMS,
+    ANALYSIS_ENABLED,
+    RENDER_QUALITY,
+    ARTIFACT_MAX_AGE,
+    TRUST_FORWARDED_FOR
+)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifecycle manager for the FastAPI application."""
     os.makedirs(TEMP_DIR, exist_ok=True)
+    await broker.start()
     yield
+    await broker.stop()
+    await queue.close()
     if os.path.exists(TEMP_DIR):
         shutil.rmtree(TEMP_DIR)
 
@@ -31,42 +62,328 @@ app.add_middleware(
 )
 
 
-@app.post("/api/render", response_model=TaskResponse)
-async def create_render_task(data: ManimCode):
-    is_valid, error = validate_manim_code(data.code)
+def rejected(reason: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        {"error": "Render queue is full" if reason == "queue_full" else "Rate limit exceeded", "reason": reason},
+        status_code=429,
+        headers={"Retry-After": str(math.ceil(retry_after))}
+    )
+
+
+def rate_limit_client(request: Request) -> str:
+    """Rate limits apply per client address.
+    
+    The tenant field is chosen by the caller, so keying on it would let a
+    client dodge its limit by rotating tenants; it only sets fair-share
+    scheduling until the API authenticates callers. With TRUST_FORWARDED_FOR
+    the address is the last X-Forwarded-For entry, the one the proxy in
+    front of the API saw.
+    """
+    forwarded = request.headers.get("x-forwarded-for") if TRUST_FORWARDED_FOR else None
+    if forwarded:
+        return f"ip:{forwarded.split(',')[-1].strip()}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+def preflight(code: str, scene_names: Optional[List[str]],
+              quality: Optional[str]) -> Tuple[Optional[SceneAnalysis], Optional[str]]:
+    """Check the syntax and, with ANALYSIS_ENABLED, the static safety and cost limits.
+    
+    Returns (analysis or None, error or None).
+    """
+    is_valid, error = validate_manim_code(code)
     if not is_valid:
+        return None, error
+    if not ANALYSIS_ENABLED:
+        return None, None
+    
+    analysis = analyze_code(code, scene_names, quality or RENDER_QUALITY)
+    if analysis.problems:
+        return None, "; ".join(analysis.problems)
+    return analysis, None
+
+
+@app.post("/api/render", response_model=TaskResponse)
+async def create_render_task(data: ManimCode, request: Request):
+    analysis, error = preflight(data.code, [data.scene_name] if data.scene_name else None, data.quality)
+    if error:
         return JSONResponse({"error": error}, status_code=400)
     
-    # Enqueue the task in Redis
-    task_id = queue.enqueue_task(
+    task = await queue.prepare_task(
         code=data.code,
         scene_name=data.scene_name,
-        webhook_url=data.webhook_url
+        webhook_url=data.webhook_url,
+        priority=data.priority,
+        tenant=data.tenant,
+        quality=data.quality,
+        preview=data.preview,
+        output=data.output,
+        encoder_preset=data.encoder_preset,
+        analysis=analysis
     )
+    estimated_seconds = round(analysis.estimated_seconds, 1) if analysis else None
+    
+    if task.status == TaskStatus.COMPLETED:
+        # Answered by the render cache: no queue slot or rate-limit tokens needed
+        await queue.store_task(task)
+        return TaskResponse(task_id=task.id, status=task.status, estimated_seconds=estimated_seconds)
+    
+    reason, retry_after, pending = await queue.admit(rate_limit_client(request))
+    if reason:
+        return rejected(reason, retry_after)
+    
+    # Enqueue the task in Redis
+    await queue.store_task(task)
     
-    return TaskResponse(task_id=task_id)
+    position = pending + 1
+    return TaskResponse(
+        task_id=task.id,
+        position=position,
+        eta_seconds=estimate_wait(position, await queue.capacity(position)),
+        estimated_seconds=estimated_seconds
+    )
 
 
-@app.get("/api/task/{task_id}", response_model=TaskStatusResponse)
-async def get_task_status(task_id: str):
-    task = queue.get_task(task_id)
+@app.post("/api/render/batch", response_model=BatchResponse)
+async def create_batch_render_task(data: BatchRenderRequest, request: Request):
+    if len(data.items) > BATCH_MAX_ITEMS:
+        return JSONResponse({"error": f"A batch can hold at most {BATCH_MAX_ITEMS} items"}, status_code=400)
     
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
+    items = []
+    for index, item in enumerate(data.items):
+        is_valid, error = validate_manim_code(item.code)
+        if not is_valid:
+            return JSONResponse({"error": f"Item {index}: {error}"}, status_code=400)
+        
+        scene_names = extract_scene_names(item.code)
+        if not scene_names:
+            return JSONResponse({"error": f"Item {index}: code defines no Scene class"}, status_code=400)
+        
+        if item.scene_names:
+            missing = [name for name in item.scene_names if name not in scene_names]
+            if missing:
+                return JSONResponse({"error": f"Item {index}: scenes not found: {', '.join(missing)}"}, status_code=400)
+            scene_names = list(dict.fromkeys(item.scene_names))
+        
+        analysis, error = preflight(item.code, scene_names, data.quality)
+        if error:
+            return JSONResponse({"error": f"Item {index}: {error}"}, status_code=400)
+        
+        items.append({"code": item.code, "scene_names": scene_names, "analysis": analysis})
+    
+    group_id, tasks = await queue.prepare_batch(
+        items,
+        webhook_url=data.webhook_url,
+        priority=data.priority,
+        tenant=data.tenant,
+        quality=data.quality
+    )
+    task_ids = [task.id for task in tasks]
+    
+    # Items answered by the render cache take no queue slot or rate-limit tokens
+    queued = sum(1 for task in tasks if task.status != TaskStatus.COMPLETED)
+    if not queued:
+        await queue.store_batch(group_id, tasks)
+        return BatchResponse(group_id=group_id, task_ids=task_ids, eta_seconds=0)
+    
+    reason, retry_after, pending = await queue.admit(rate_limit_client(request), cost=queued)
+    if reason:
+        return rejected(reason, retry_after)
     
+    await queue.store_batch(group_id, tasks)
+    
+    position = pending + queued
+    return BatchResponse(
+        group_id=group_id,
+        task_ids=task_ids,
+        eta_seconds=estimate_wait(position, await queue.capacity(position))
+    )
+
+
+def to_status_response(task: Task) -> TaskStatusResponse:
     return TaskStatusResponse(
         task_id=task.id,
         status=task.status,
         result=task.result,
-        error=task.error
+        error=task.error,
+        progress=task.progress
+    )
+
+
+def group_status(tasks: List[Task]) -> TaskStatus:
+    """Pending or completed only when every task is; failed once all finished and any failed."""
+    statuses = {task.status for task in tasks}
+    if statuses <= {TaskStatus.PENDING}:
+        return TaskStatus.PENDING
+    if statuses == {TaskStatus.COMPLETED}:
+        return TaskStatus.COMPLETED
+    if statuses <= {TaskStatus.COMPLETED, TaskStatus.FAILED}:
+        return TaskStatus.FAILED
+    return TaskStatus.PROCESSING
+
+
+@app.get("/api/group/{group_id}", response_model=GroupStatusResponse)
+async def get_group_status(group_id: str):
+    tasks = await queue.get_group(group_id)
+    
+    if not tasks:
+        raise HTTPException(status_code=404, detail="Group not found")
+    
+    return GroupStatusResponse(
+        group_id=group_id,
+        status=group_status(tasks),
+        tasks=[to_status_response(task) for task in tasks]
+    )
+
+
+@app.get("/api/task/{task_id}", response_model=TaskStatusResponse)
+async def get_task_status(task_id: str):
+    task = await queue.get_task(task_id)
+    
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    return to_status_response(task)
+
+
+def is_final(task: Task) -> bool:
+    """Whether no further updates will follow, including a pending full-quality pass."""
+    if task.status == TaskStatus.FAILED:
+        return True
+    result = task.result or {}
+    return task.status == TaskStatus.COMPLETED and (
+        "video_url" in result or "video_error" in result or "full_task_id" not in result
+    )
+
+
+async def stream_events(request: Request, task_id: Optional[str] = None):
+    async with broker.subscribe(task_id) as events:
+        if task_id:
+            # Subscribe first, then send a snapshot so no update is missed in between
+            task = await queue.get_task(task_id)
+            if not task:
+                return
+            yield format_sse({
+                "type": "snapshot",
+                "task_id": task.id,
+                "status": task.status,
+                "result": task.result,
+                "error": task.error,
+                "progress": task.progress
+            })
+            if is_final(task):
+                return
+        
+        while not await request.is_disconnected():
+            try:
+                event = await asyncio.wait_for(events.get(), timeout=EVENT_KEEPALIVE_INTERVAL)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            
+            yield format_sse(event)
+            if task_id and (event.get("status") in (TaskStatus.COMPLETED, TaskStatus.FAILED)
+                            or event.get("type") == "result_update"):
+                task = await queue.get_task(task_id)
+                if not task or is_final(task):
+                    return
+
+
+@app.get("/api/task/{task_id}/events")
+async def task_events(task_id: str, request: Request):
+    if not await queue.get_task(task_id):
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    return StreamingResponse(
+        stream_events(request, task_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/api/events")
+async def all_events(request: Request):
+    return StreamingResponse(
+        stream_events(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/api/tasks", response_model=List[TaskStatusResponse])
+async def list_tasks(limit: int = Query(50, ge=1, le=500), offset: int = Query(0, ge=0)):
+    return [to_status_response(task) for task in await queue.list_tasks(limit=limit, offset=offset)]
+
+
+@app.get("/api/autoscale", response_model=AutoscaleResponse)
+async def autoscale_signal():
+    """Desired worker count for an external autoscaler, from backlog and service time."""
+    capacity = await queue.capacity()
+    return AutoscaleResponse(
+        queue_depth=capacity["pending"],
+        workers=capacity["workers"],
+        busy_workers=capacity["busy"],
+        service_time_seconds=capacity["service_time"],
+        desired_workers=desired_workers(capacity)
+    )
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus scrape endpoint covering the API and every worker."""
+    return PlainTextResponse(
+        await collect_metrics(queue.redis),
+        media_type="text/plain; version=0.0.4"
     )
 
 
+MEDIA_TYPES = {
+    ".mp4": "video/mp4",
+    ".png": "image/png",
+    ".ts": "video/mp2t",
+    ".m3u8": "application/vnd.apple.mpegurl",
+}
+local_store = next((store for store in (artifact_store, preview_store) if isinstance(store, LocalStore)), None)
+
+
+@app.get("/media/{key:path}")
+async def media(key: str, request: Request):
+    """Serve artifacts of the local store, with Range, ETag and caching headers.
+    
+    Starlette answers Range requests itself and hands the file to the server
+    as a path (zero-copy where the server supports it). Playlists may still
+    grow, so only they are revalidated; every other key is written once.
+    """
+    path = local_store.path(key) if local_store else None
+    if not path:
+        raise HTTPException(status_code=404, detail="Not found")
+    
+    try:
+        stat_result = await asyncio.to_thread(os.stat, path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise HTTPException(status_code=404, detail="Not found")
+    if not S_ISREG(stat_result.st_mode):
+        raise HTTPException(status_code=404, detail="Not found")
+    
+    extension = os.path.splitext(key)[1]
+    cache_control = "no-cache" if extension == ".m3u8" else f"public, max-age={ARTIFACT_MAX_AGE}, immutable"
+    response = FileResponse(
+        path,
+        stat_result=stat_result,
+        media_type=MEDIA_TYPES.get(extension, "application/octet-stream"),
+        headers={"Cache-Control": cache_control}
+    )
+    
+    if request.headers.get("if-none-match") == response.headers["etag"]:
+        return Response(status_code=304, headers={"ETag": response.headers["etag"], "Cache-Control": cache_control})
+    return response
+
+
 @app.get("/health")
 async def health_check():
     try:
         # Try to ping Redis
-        if queue.redis.ping():
+        if await queue.redis.ping():
             return {"status": "ok", "redis": "connected"}
         return {"status": "degraded", "redis": "not responding"}
     except Exception as e:
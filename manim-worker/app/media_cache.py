@@ -0,0 +1,278 @@
+import os
+import time
+import hashlib
+import fcntl
+import shutil
+import logging
+import tempfile
+from contextlib import contextmanager, nullcontext
+from typing import Optional, Iterator, List, Tuple, Dict, Any
+
+from .config import (
+    QUALITY_DIRS,
+    PARTIAL_CACHE_ENABLED,
+    PARTIAL_CACHE_DIR,
+    PARTIAL_CACHE_MAX_MB,
+    TEX_CACHE_ENABLED,
+    TEX_CACHE_DIR,
+    TEXT_CACHE_DIR,
+    TEX_CACHE_MAX_MB,
+    MEDIA_CACHE_MIN_AGE
+)
+
+
+logger = logging.getLogger("manim-media-cache")
+
+LOCK_FILE = ".lock"
+PARTIAL_LIST_FILE = "partial_movie_file_list.txt"
+COMPILE_DIR_PREFIX = ".compile-"
+STALE_COMPILE_SECONDS = 3600
+
+
+def partial_movie_dir(quality: str, scope: str, scene_name: str) -> str:
+    """Shared partial-movie directory for a scene class at a given quality.
+
+    Manim names partial movies by a hash of the camera, mobjects and animation
+    of each play() call, not by the module they came from, so an edited scene
+    rendered into the same directory only re-renders the animations that
+    changed and concatenates the rest. Directories are split by scope, e.g.
+    the tenant, so unrelated scenes that share a class name don't wait on
+    each other's lock.
+    """
+    scope_hash = hashlib.sha256(scope.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(PARTIAL_CACHE_DIR, QUALITY_DIRS[quality], scope_hash, scene_name)
+
+
+@contextmanager
+def locked_dir(directory: str, blocking: bool = True, shared: bool = False) -> Iterator[bool]:
+    """Hold an exclusive (or shared) flock on a cache directory.
+
+    Renders of the same scene write partial movies and the partial movie list
+    in place, so they take the lock for the whole render; the pruner takes it
+    without blocking and skips directories in use. Yields whether the lock was
+    acquired.
+    """
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, LOCK_FILE), "w") as lock:
+        try:
+            mode = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+            fcntl.flock(lock, mode | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def touch_used_partials(directory: str) -> None:
+    """Mark the partial movies used by the last render as recently used."""
+    list_path = os.path.join(directory, PARTIAL_LIST_FILE)
+    if not os.path.exists(list_path):
+        return
+
+    with open(list_path) as f:
+        for line in f:
+            # Lines look like: file 'file:/path/to/partial.mp4'
+            if not line.startswith("file "):
+                continue
+            path = line[5:].strip().strip("'")
+            path = path[5:] if path.startswith("file:") else path
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+
+
+def _cache_entries(root: str) -> List[Tuple[float, int, List[str]]]:
+    """Group cached files by name without extension, e.g. a formula's .tex, .dvi and .svg."""
+    entries: Dict[str, List] = {}
+    for directory, subdirectories, names in os.walk(root):
+        # Compile directories of in-flight Tex renders are not cache entries
+        subdirectories[:] = [name for name in subdirectories if not name.startswith(COMPILE_DIR_PREFIX)]
+        for name in names:
+            if name in (LOCK_FILE, PARTIAL_LIST_FILE):
+                continue
+            path = os.path.join(directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entry = entries.setdefault(os.path.splitext(path)[0], [0.0, 0, []])
+            entry[0] = max(entry[0], stat.st_mtime)
+            entry[1] += stat.st_size
+            entry[2].append(path)
+    return [tuple(entry) for entry in entries.values()]
+
+
+def _remove_stale_compile_dirs(root: str) -> None:
+    """Remove compile directories left behind by renders that died mid-compile."""
+    cutoff = time.time() - STALE_COMPILE_SECONDS
+    for entry in os.scandir(root):
+        try:
+            if entry.name.startswith(COMPILE_DIR_PREFIX) and entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+        except FileNotFoundError:
+            continue
+
+
+def prune_cache(root: str, max_bytes: int) -> int:
+    """Delete least recently used entries under root until it fits in max_bytes.
+
+    Every entry takes the lock of its directory: subdirectories locked by a
+    running render are skipped, and root-level Tex and Text files are looked
+    up under a shared lock on the root, so the exclusive lock held here keeps
+    a lookup from touching an entry while it is deleted. Entries used within
+    MEDIA_CACHE_MIN_AGE are kept, since a render may still be about to read
+    a file it just looked up. Returns the number of bytes freed.
+    """
+    if not os.path.isdir(root):
+        return 0
+
+    with locked_dir(root, blocking=False) as acquired:
+        if not acquired:
+            return 0  # already pruning, or in use; try again next round
+
+        _remove_stale_compile_dirs(root)
+        entries = _cache_entries(root)
+        total = sum(size for _, size, _ in entries)
+        freed = 0
+        cutoff = time.time() - MEDIA_CACHE_MIN_AGE
+
+        for used, size, paths in sorted(entries):
+            if total - freed <= max_bytes or used > cutoff:
+                break
+            directory = os.path.dirname(paths[0])
+            with locked_dir(directory, blocking=False) if directory != root else nullcontext(True) as idle:
+                if not idle:
+                    continue
+                for path in paths:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                freed += size
+
+    if freed:
+        logger.info(f"Pruned {freed} bytes from {root}")
+    return freed
+
+
+def prune_media_caches() -> int:
+    freed = 0
+    if PARTIAL_CACHE_ENABLED:
+        freed += prune_cache(PARTIAL_CACHE_DIR, PARTIAL_CACHE_MAX_MB * 1024 * 1024)
+    if TEX_CACHE_ENABLED:
+        freed += prune_cache(TEX_CACHE_DIR, TEX_CACHE_MAX_MB * 1024 * 1024)
+        freed += prune_cache(TEXT_CACHE_DIR, TEX_CACHE_MAX_MB * 1024 * 1024)
+    return freed
+
+
+def manim_cache_options(partial_quality: Optional[str] = None, scope: str = "") -> Dict[str, Any]:
+    """Manim config that points a render at the shared caches.
+
+    Tex and Text files are already named by a hash of their content and
+    template, so the shared directories need no index of their own. Manim's
+    LaTeX cleanup would delete other renders' in-flight files from the shared
+    directory, so it is off; install_tex_cache_guard() compiles in a private
+    directory instead. With a quality, partial movies go to the shared
+    directory of each scene in the scope; manim fills in {scene_name} itself.
+    """
+    options: Dict[str, Any] = {}
+    if TEX_CACHE_ENABLED:
+        options.update({"tex_dir": TEX_CACHE_DIR, "text_dir": TEXT_CACHE_DIR, "no_latex_cleanup": True})
+    if partial_quality:
+        # Our own pruning bounds the cache, so manim shouldn't drop files itself
+        options.update({
+            "partial_movie_dir": partial_movie_dir(partial_quality, scope, "{scene_name}"),
+            "max_files_cached": -1
+        })
+    return options
+
+
+def _shared_tex_to_svg_file(compile_svg):
+    """Wrap manim's tex_to_svg_file to compile into a private directory.
+
+    Lookups run under a shared lock on the cache directory and mark hits as
+    recently used for the pruner. A miss compiles in a fresh directory next
+    to the cache, so concurrent renders never see each other's .dvi, .aux or
+    half-written .svg files, and the finished .svg is renamed into place. Two
+    renders compiling the same formula just replace it with the same file.
+    """
+    from manim import config
+    from manim.utils.tex_file_writing import tex_hash
+
+    def tex_to_svg_file(expression, environment=None, tex_template=None):
+        tex_template = tex_template or config["tex_template"]
+        if environment is not None:
+            source = tex_template.get_texcode_for_expression_in_env(expression, environment)
+        else:
+            source = tex_template.get_texcode_for_expression(expression)
+        tex_dir = config.get_dir("tex_dir")
+        svg_file = tex_dir / f"{tex_hash(source)}.svg"
+
+        with locked_dir(str(tex_dir), shared=True):
+            try:
+                os.utime(svg_file)
+                return svg_file
+            except FileNotFoundError:
+                pass
+
+        compile_dir = tempfile.mkdtemp(prefix=COMPILE_DIR_PREFIX, dir=tex_dir)
+        configured_dir = config.tex_dir
+        try:
+            config.tex_dir = compile_dir
+            os.replace(compile_svg(expression, environment, tex_template), svg_file)
+        finally:
+            config.tex_dir = configured_dir
+            shutil.rmtree(compile_dir, ignore_errors=True)
+        return svg_file
+
+    return tex_to_svg_file
+
+
+def install_tex_cache_guard() -> None:
+    """Make this process's manim compile Tex safely into the shared cache.
+
+    Called once per renderer and CLI render process, after manim is imported.
+    """
+    if not TEX_CACHE_ENABLED:
+        return
+    from manim.utils import tex_file_writing
+    from manim.mobject.text import tex_mobject
+
+    guarded = _shared_tex_to_svg_file(tex_file_writing.tex_to_svg_file)
+    tex_file_writing.tex_to_svg_file = guarded
+    tex_mobject.tex_to_svg_file = guarded  # imported by name
+
+
+def prewarm_tex_cache(path: str) -> int:
+    """Compile every formula in a file (one per line) into the shared Tex cache."""
+    from manim import MathTex, tempconfig
+
+    install_tex_cache_guard()
+
+    with open(path) as f:
+        formulas = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+    warmed = 0
+    with tempconfig(manim_cache_options()):
+        for formula in formulas:
+            try:
+                MathTex(formula)
+                warmed += 1
+            except Exception as e:
+                logger.warning(f"Failed to pre-warm formula {formula!r}: {str(e)}")
+
+    logger.info(f"Pre-warmed {warmed} of {len(formulas)} formulas")
+    return warmed
+
+
+def write_cli_config(path: str, options: Dict[str, Any]) -> str:
+    """Write manim config options to a file for the CLI's --config_file."""
+    with open(path, "w") as f:
+        f.write("[CLI]\n")
+        for name, value in options.items():
+            f.write(f"{name} = {value}\n")
+    return path
@@ -0,0 +1,225 @@
+import time
+import logging
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, List, Iterator
+from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
+
+from .config import (
+    REDIS_HOST,
+    REDIS_PORT,
+    REDIS_DB,
+    REDIS_PASSWORD,
+    METRICS_ENABLED,
+    METRICS_PREFIX,
+    PENDING_COUNT,
+    HEARTBEAT_INTERVAL,
+    RENDER_TIMEOUT_MAX
+)
+from .render_cache import LRU_KEY, STATS_KEY
+from .serialization import dumps, loads
+
+try:
+    from opentelemetry import trace
+    tracer = trace.get_tracer("manim-worker")
+except ImportError:  # spans are optional
+    tracer = None
+
+
+logger = logging.getLogger("manim-metrics")
+
+# Stages of a render task, roughly in the order they happen
+STAGES = (
+    "queue_wait",
+    "temp_file_write",
+    "manim_import",
+    "scene_exec",
+    "frame_render",
+    "encode",
+    "concat",  # joining the ranges of a parallel render
+    "manim_cli",  # import, render and encode of a CLI render, which can't be split
+    "s3_upload",  # to the artifact store, S3 or local
+    "hls_segment",  # cutting, encoding and uploading HLS segments, alongside the render
+    "webhook",
+    "task_total",
+)
+BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 180, 300)
+
+COUNTERS_KEY = f"{METRICS_PREFIX}:counters"
+WORKERS_KEY = f"{METRICS_PREFIX}:workers"
+
+
+def stage_key(stage: str) -> str:
+    return f"{METRICS_PREFIX}:stage:{stage}"
+
+
+class Metrics:
+    """Shared metrics recorded in Redis, so the API can report for every worker process.
+
+    Stage histograms keep one counter per bucket plus count and sum in a hash
+    per stage; the API makes the buckets cumulative when it renders them.
+    Recording never fails a task: errors are logged and dropped.
+    """
+
+    def __init__(self):
+        self.redis = Redis(
+            host=REDIS_HOST,
+            port=REDIS_PORT,
+            db=REDIS_DB,
+            password=REDIS_PASSWORD,
+            decode_responses=True
+        )
+
+    def observe(self, stage: str, seconds: float) -> None:
+        if not METRICS_ENABLED:
+            return
+        index = bisect_left(BUCKETS, seconds)
+        bucket = str(BUCKETS[index]) if index < len(BUCKETS) else "+Inf"
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.hincrby(stage_key(stage), bucket, 1)
+            pipe.hincrby(stage_key(stage), "count", 1)
+            pipe.hincrbyfloat(stage_key(stage), "sum", seconds)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to record {stage} timing: {str(e)}")
+
+    @contextmanager
+    def timed(self, stage: str, task_id: Optional[str] = None) -> Iterator[None]:
+        """Time a block into the stage histogram, and as a span when OpenTelemetry is installed."""
+        start = time.perf_counter()
+        try:
+            if tracer:
+                with tracer.start_as_current_span(stage, attributes={"task_id": task_id or ""}):
+                    yield
+            else:
+                yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def count(self, name: str, amount: int = 1) -> None:
+        if not METRICS_ENABLED:
+            return
+        try:
+            self.redis.hincrby(COUNTERS_KEY, name, amount)
+        except Exception as e:
+            logger.warning(f"Failed to record {name}: {str(e)}")
+
+    def worker_state(self, worker_id: str, busy: bool) -> None:
+        if not METRICS_ENABLED:
+            return
+        try:
+            self.redis.hset(WORKERS_KEY, worker_id, dumps({"busy": busy, "seen": time.time()}))
+        except Exception as e:
+            logger.warning(f"Failed to record state of worker {worker_id}: {str(e)}")
+
+
+    def prune_workers(self) -> int:
+        """Forget workers that stopped reporting, e.g. after a restart."""
+        now = time.time()
+        stale = [
+            worker_id for worker_id, state in self.redis.hgetall(WORKERS_KEY).items()
+            if not is_live(loads(state), now)
+        ]
+        if stale:
+            self.redis.hdel(WORKERS_KEY, *stale)
+        return len(stale)
+
+
+def is_live(state: Dict[str, Any], now: float) -> bool:
+    # A busy worker may go quiet for a whole render; an idle one checks in every heartbeat
+    limit = 3 * HEARTBEAT_INTERVAL + (RENDER_TIMEOUT_MAX if state["busy"] else 0)
+    return now - state["seen"] < limit
+
+
+def _labels(**labels: str) -> str:
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels.items()) + "}"
+
+
+def format_prometheus(stages: Dict[str, Dict[str, str]], counters: Dict[str, str],
+                      workers: Dict[str, str], pending: int, cache_stats: Dict[str, str],
+                      cache_entries: int) -> str:
+    """Render the collected values in the Prometheus text exposition format."""
+    lines: List[str] = [
+        "# HELP manim_stage_seconds Time spent in each stage of a render task",
+        "# TYPE manim_stage_seconds histogram",
+    ]
+    for stage in STAGES:
+        fields = stages.get(stage) or {}
+        cumulative = 0
+        for bucket in (*[str(b) for b in BUCKETS], "+Inf"):
+            cumulative += int(fields.get(bucket, 0))
+            lines.append(f"manim_stage_seconds_bucket{_labels(stage=stage, le=bucket)} {cumulative}")
+        lines.append(f"manim_stage_seconds_sum{_labels(stage=stage)} {float(fields.get('sum', 0))}")
+        lines.append(f"manim_stage_seconds_count{_labels(stage=stage)} {int(fields.get('count', 0))}")
+
+    lines += [
+        "# HELP manim_tasks_total Finished tasks by outcome",
+        "# TYPE manim_tasks_total counter",
+    ]
+    for status in ("completed", "failed"):
+        lines.append(f"manim_tasks_total{_labels(status=status)} {int(counters.get(f'tasks_{status}', 0))}")
+
+    lines += [
+        "# HELP manim_webhooks_total Webhook deliveries by outcome",
+        "# TYPE manim_webhooks_total counter",
+    ]
+    for outcome in ("delivered", "retried", "dead"):
+        lines.append(f"manim_webhooks_total{_labels(outcome=outcome)} {int(counters.get(f'webhooks_{outcome}', 0))}")
+
+    lines += [
+        "# HELP manim_queue_depth Tasks waiting to be claimed",
+        "# TYPE manim_queue_depth gauge",
+        f"manim_queue_depth {pending}",
+    ]
+
+    now = time.time()
+    states = [state for state in map(loads, workers.values()) if is_live(state, now)]
+    busy = sum(1 for state in states if state["busy"])
+    idle = len(states) - busy
+    lines += [
+        "# HELP manim_workers Live worker threads by state",
+        "# TYPE manim_workers gauge",
+        f"manim_workers{_labels(state='busy')} {busy}",
+        f"manim_workers{_labels(state='idle')} {idle}",
+        "# HELP manim_tasks_in_flight Tasks currently being rendered",
+        "# TYPE manim_tasks_in_flight gauge",
+        f"manim_tasks_in_flight {busy}",
+    ]
+
+    for name in ("hits", "misses", "evictions"):
+        lines += [
+            f"# TYPE manim_render_cache_{name}_total counter",
+            f"manim_render_cache_{name}_total {int(cache_stats.get(name, 0))}",
+        ]
+    lines += [
+        "# TYPE manim_render_cache_entries gauge",
+        f"manim_render_cache_entries {cache_entries}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+async def collect(redis: AsyncRedis) -> str:
+    """Read every metric in one round trip and render them for /metrics."""
+    pipe = redis.pipeline(transaction=False)
+    for stage in STAGES:
+        pipe.hgetall(stage_key(stage))
+    pipe.hgetall(COUNTERS_KEY)
+    pipe.hgetall(WORKERS_KEY)
+    pipe.get(PENDING_COUNT)
+    pipe.hgetall(STATS_KEY)
+    pipe.zcard(LRU_KEY)
+    *stage_fields, counters, workers, pending, cache_stats, cache_entries = await pipe.execute()
+
+    return format_prometheus(
+        dict(zip(STAGES, stage_fields)),
+        counters,
+        workers,
+        int(pending or 0),
+        cache_stats,
+        cache_entries
+    )
+
+
+metrics = Metrics()
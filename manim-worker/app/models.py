@@ -1,7 +1,8 @@
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any, Literal
+from typing import Optional, Dict, Any, List, Literal, ClassVar, Set
 from enum import Enum
-import json
+
+from .serialization import dumps, loads
 
 class TaskStatus(str, Enum):
     PENDING = "pending"
@@ -10,15 +11,64 @@ class TaskStatus(str, Enum):
     FAILED = "failed"
 
 
+class TaskPriority(str, Enum):
+    """Scheduling class, served strictly in this order"""
+    INTERACTIVE = "interactive"
+    DEFAULT = "default"
+    BATCH = "batch"
+
+
+class OutputFormat(str, Enum):
+    MP4 = "mp4"
+    HLS = "hls" # segments uploaded while the scene renders
+
+
+class EncoderPreset(str, Enum):
+    """x264 preset for HLS segments; COPY keeps manim's own encode"""
+    COPY = "copy"
+    ULTRAFAST = "ultrafast"
+    SUPERFAST = "superfast"
+    VERYFAST = "veryfast"
+    FASTER = "faster"
+    FAST = "fast"
+    MEDIUM = "medium"
+    SLOW = "slow"
+
+
+RenderQuality = Literal["l", "m", "h", "p", "k"]
+
+
 class ManimCode(BaseModel):
     code: str
     scene_name: Optional[str] = None
     webhook_url: Optional[str] = None # Optional
+    priority: TaskPriority = TaskPriority.DEFAULT
+    tenant: Optional[str] = None # e.g. the user id, for fair-share between users
+    quality: Optional[RenderQuality] = None # manim -q flag, defaults to RENDER_QUALITY
+    preview: bool = False # return a fast low-quality preview first, then the full render
+    output: OutputFormat = OutputFormat.MP4 # HLS replaces the preview pass
+    encoder_preset: Optional[EncoderPreset] = None # defaults to ENCODER_PRESETS for the quality
+
+
+class BatchRenderItem(BaseModel):
+    code: str
+    scene_names: Optional[List[str]] = None # defaults to every scene in the code
+
+
+class BatchRenderRequest(BaseModel):
+    items: List[BatchRenderItem] = Field(..., min_length=1)
+    webhook_url: Optional[str] = None # notified once per item
+    priority: TaskPriority = TaskPriority.BATCH
+    tenant: Optional[str] = None
+    quality: Optional[RenderQuality] = None
 
 
 class TaskResponse(BaseModel):
     task_id: str
     status: TaskStatus = TaskStatus.PENDING
+    position: Optional[int] = None # approximate place in the queue when enqueued
+    eta_seconds: Optional[float] = None # estimated time until the render finishes
+    estimated_seconds: Optional[float] = None # estimated render time once a worker picks it up
 
 
 class TaskStatusResponse(BaseModel):
@@ -26,6 +76,27 @@ class TaskStatusResponse(BaseModel):
     status: TaskStatus
     result: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
+    progress: Optional[Dict[str, Any]] = None
+
+
+class BatchResponse(BaseModel):
+    group_id: str
+    task_ids: List[str]
+    eta_seconds: Optional[float] = None # estimated time until the whole batch finishes
+
+
+class AutoscaleResponse(BaseModel):
+    queue_depth: int
+    workers: int
+    busy_workers: int
+    service_time_seconds: float
+    desired_workers: int
+
+
+class GroupStatusResponse(BaseModel):
+    group_id: str
+    status: TaskStatus
+    tasks: List[TaskStatusResponse]
 
 
 class RenderResult(BaseModel):
@@ -35,19 +106,55 @@ class RenderResult(BaseModel):
 class Task(BaseModel):
     """Represents a task for the queue system"""
     id: str
-    code: str
+    code: Optional[str] = None # kept in its own content-addressed key; only claims load it
+    code_hash: Optional[str] = None
     scene_name: Optional[str] = None
+    scene_names: Optional[List[str]] = None # several scenes rendered in one go
     webhook_url: Optional[str] = None
     status: TaskStatus = TaskStatus.PENDING
     result: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
+    priority: TaskPriority = TaskPriority.DEFAULT
+    tenant: Optional[str] = None
+    quality: Optional[RenderQuality] = None
+    preview: bool = False
+    output: OutputFormat = OutputFormat.MP4
+    encoder_preset: Optional[EncoderPreset] = None
+    parent_id: Optional[str] = None
+    group_id: Optional[str] = None
+    cache_key: Optional[str] = None
+    estimated_seconds: Optional[float] = None # from the pre-flight analysis
+    timeout: Optional[float] = None # render timeout, RENDER_TIMEOUT when unset
+    animations: Optional[int] = None # play()/wait() calls, when the analysis could count them exactly
+    attempts: int = 0
+    progress: Optional[Dict[str, Any]] = None
+    created_at: Optional[float] = None
+    
+    # Fields stored as JSON strings inside the task hash
+    json_fields: ClassVar[Set[str]] = {"result", "progress", "scene_names"}
+    
+    def to_redis(self) -> Dict[str, str]:
+        """Convert task to flat Redis hash fields, without the code"""
+        fields = {}
+        for name, value in self.model_dump(mode="json", exclude_none=True, exclude={"code"}).items():
+            fields[name] = value if isinstance(value, str) else dumps(value)
+        return fields
+    
+    @classmethod
+    def from_redis(cls, fields: Dict[str, str]) -> 'Task':
+        """Create task from Redis hash fields"""
+        data = {
+            name: loads(value) if name in cls.json_fields else value
+            for name, value in fields.items()
+        }
+        return cls(**data)
     
     def to_json(self) -> str:
         """Convert task to JSON string"""
-        return json.dumps(self.dict())
+        return dumps(self.model_dump(mode="json"))
     
     @classmethod
     def from_json(cls, json_str: str) -> 'Task':
         """Create task from JSON string"""
-        data = json.loads(json_str)
+        data = loads(json_str)
         return cls(**data)
\ No newline at end of file
@@ -0,0 +1,157 @@
+import ast
+import json
+import time
+import hashlib
+from typing import Optional, Dict, Any, List
+from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
+
+from .config import (
+    RENDER_CACHE_PREFIX,
+    RENDER_CACHE_TTL,
+    RENDER_CACHE_MAX_ENTRIES,
+    ARTIFACT_STORE,
+    ARTIFACT_TTL,
+    RENDER_TIMEOUT_MAX
+)
+from .serialization import dumps, loads
+
+
+def normalize_code(code: str) -> str:
+    """Normalize Manim source so formatting and comments don't change the cache key."""
+    try:
+        return ast.dump(ast.parse(code))
+    except SyntaxError:
+        return code.strip()
+
+
+def render_cache_key(code: str, scene_name: Optional[str], quality: str, output: str = "mp4") -> str:
+    """Build a content-addressed key from the normalized code, scene, quality and output format."""
+    fields = {
+        "code": normalize_code(code),
+        "scene_name": scene_name,
+        "quality": quality
+    }
+    if output != "mp4":
+        fields["output"] = output  # MP4 keys stay as they were
+    payload = json.dumps(fields, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+LRU_KEY = f"{RENDER_CACHE_PREFIX}:lru"
+STATS_KEY = f"{RENDER_CACHE_PREFIX}:stats"
+
+# The local store prunes artifacts ARTIFACT_TTL after they were written (HLS
+# segments up to a render earlier than the entry), so entries pointing at
+# them expire before that and hits don't extend them. S3 artifacts outlive
+# the cache, so there every hit renews the entry.
+if ARTIFACT_STORE == "local":
+    ENTRY_TTL = max(1, min(RENDER_CACHE_TTL, ARTIFACT_TTL - RENDER_TIMEOUT_MAX))
+    SLIDING_TTL = False
+else:
+    ENTRY_TTL = RENDER_CACHE_TTL
+    SLIDING_TTL = True
+
+# KEYS: entry, LRU index, stats hash
+# ARGV: cache key, now, ttl, '1' to renew the entry's TTL on a hit
+# Looks up an entry and records the hit or miss in one round trip
+LOOKUP_SCRIPT = """
+local entry = redis.call('GET', KEYS[1])
+if entry then
+    if ARGV[4] == '1' then redis.call('EXPIRE', KEYS[1], ARGV[3]) end
+    redis.call('ZADD', KEYS[2], ARGV[2], ARGV[1])
+    redis.call('HINCRBY', KEYS[3], 'hits', 1)
+else
+    redis.call('ZREM', KEYS[2], ARGV[1])
+    redis.call('HINCRBY', KEYS[3], 'misses', 1)
+end
+return entry
+"""
+
+
+def entry_key(cache_key: str) -> str:
+    return f"{RENDER_CACHE_PREFIX}:{cache_key}"
+
+
+def lookup_args(cache_key: str) -> Dict[str, list]:
+    return {
+        "keys": [entry_key(cache_key), LRU_KEY, STATS_KEY],
+        "args": [cache_key, time.time(), ENTRY_TTL, "1" if SLIDING_TTL else "0"]
+    }
+
+
+class RenderCache:
+    """Redis-backed cache of finished renders with TTL and LRU eviction."""
+
+    def __init__(self, redis: Redis):
+        self.redis = redis
+        self.lru_key = LRU_KEY
+        self.stats_key = STATS_KEY
+        self._lookup = self.redis.register_script(LOOKUP_SCRIPT)
+
+    def get(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        entry = self._lookup(**lookup_args(cache_key))
+        return loads(entry) if entry else None
+
+    def peek(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """Look up an entry without counting a hit or miss, e.g. re-checking a task already counted at enqueue."""
+        entry = self.redis.get(entry_key(cache_key))
+        return loads(entry) if entry else None
+
+    def put(self, cache_key: str, result: Dict[str, Any]) -> None:
+        now = time.time()
+
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.set(entry_key(cache_key), dumps(result), ex=ENTRY_TTL)
+        pipe.zadd(self.lru_key, {cache_key: now})
+        # Entries whose TTL already lapsed only linger in the LRU index
+        pipe.zremrangebyscore(self.lru_key, "-inf", now - ENTRY_TTL)
+        pipe.zcard(self.lru_key)
+        size = pipe.execute()[-1]
+
+        if size > RENDER_CACHE_MAX_ENTRIES:
+            self.evict(size - RENDER_CACHE_MAX_ENTRIES)
+
+    def evict(self, count: int) -> int:
+        """Drop the least recently used entries."""
+        evicted = self.redis.zpopmin(self.lru_key, count)
+        if not evicted:
+            return 0
+
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.delete(*[entry_key(key) for key, _ in evicted])
+        pipe.hincrby(self.stats_key, "evictions", len(evicted))
+        pipe.execute()
+        return len(evicted)
+
+    def stats(self) -> Dict[str, int]:
+        stats = {key: int(value) for key, value in self.redis.hgetall(self.stats_key).items()}
+        stats.setdefault("hits", 0)
+        stats.setdefault("misses", 0)
+        stats.setdefault("evictions", 0)
+        stats["entries"] = self.redis.zcard(self.lru_key)
+        return stats
+
+
+class AsyncRenderCache:
+    """Read side of the render cache for the asyncio API client."""
+
+    def __init__(self, redis: AsyncRedis):
+        self.redis = redis
+        self._lookup = self.redis.register_script(LOOKUP_SCRIPT)
+
+    async def get(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        entry = await self._lookup(**lookup_args(cache_key))
+        return loads(entry) if entry else None
+    
+    async def get_many(self, cache_keys: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Look up several entries in one round trip."""
+        pipe = self.redis.pipeline(transaction=False)
+        for cache_key in cache_keys:
+            lookup = lookup_args(cache_key)
+            pipe.eval(LOOKUP_SCRIPT, len(lookup["keys"]), *lookup["keys"], *lookup["args"])
+        entries = await pipe.execute()
+        return {
+            cache_key: loads(entry) if entry else None
+            for cache_key, entry in zip(cache_keys, entries)
+        }
@@ -0,0 +1,47 @@
+"""Entry point for CLI renders: `python -m app.render_cli <manim arguments>`.
+
+The worker runs this instead of the manim executable, so a CLI render sets
+itself up like a pooled renderer before handing over to manim's own CLI. The
+task's rlimits are applied here, in the child, because a preexec_fn is not
+safe to run from the heavily threaded worker.
+"""
+import os
+import sys
+from typing import Dict, List, Optional
+
+from .limits import apply_task_limits
+from .media_cache import install_tex_cache_guard
+
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def cli_command(*args: str) -> List[str]:
+    return [sys.executable, "-m", "app.render_cli", *args]
+
+
+def cli_env(cpus: Optional[List[int]] = None) -> Dict[str, str]:
+    """The worker's environment, able to import this package from a workspace directory.
+
+    With cpus, the render runs on those CPUs instead of the worker's own slice.
+    """
+    python_path = [PACKAGE_ROOT, os.environ.get("PYTHONPATH", "")]
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, python_path))}
+    if cpus:
+        env["RENDER_CPUS"] = ",".join(map(str, cpus))
+    return env
+
+
+def main() -> None:
+    cpus = os.environ.get("RENDER_CPUS")
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {int(cpu) for cpu in cpus.split(",")})
+    apply_task_limits()
+    from manim.__main__ import main as manim_main
+
+    install_tex_cache_guard()
+    manim_main()
+
+
+if __name__ == "__main__":
+    main()
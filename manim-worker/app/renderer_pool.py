@@ -0,0 +1,242 @@
+import time
+import uuid
+import types
+import resource
+import traceback
+import multiprocessing
+from queue import Queue
+from typing import Tuple, Dict, Any, Callable, Optional, List, Union
+
+from .config import RENDERER_MAX_TASKS, RENDERER_MAX_RSS_MB
+from .limits import apply_task_limits
+from .media_cache import install_tex_cache_guard
+from .metrics import metrics
+
+
+MANIM_QUALITIES = {
+    "l": "low_quality",
+    "m": "medium_quality",
+    "h": "high_quality",
+    "p": "production_quality",
+    "k": "fourk_quality",
+}
+
+
+def _rss_mb() -> float:
+    """Peak resident set size of the current process in MB (Linux reports KB)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _render_scene(module: types.ModuleType, scene_name: str, request: Dict[str, Any],
+                  report: Callable[[Dict[str, Any]], None]) -> str:
+    """Render one scene class of an already-executed module."""
+    from manim import tempconfig, config
+
+    scene_cls = getattr(module, scene_name, None)
+    if scene_cls is None:
+        raise ValueError(f"Scene {scene_name} not found in code")
+
+    module_name = module.__name__
+    options = {
+        "quality": MANIM_QUALITIES[request["quality"]],
+        "media_dir": request["media_dir"],
+        "video_dir": "{media_dir}/videos/" + module_name + "/{quality}",
+        "images_dir": "{media_dir}/images/" + module_name,
+        "output_file": scene_name,
+    }
+    if request.get("last_frame"):
+        options.update({"save_last_frame": True, "write_to_movie": False})
+    options.update(request.get("config") or {})
+
+    with tempconfig(options):
+        scene = scene_cls()
+        file_writer = scene.renderer.file_writer
+        finish = file_writer.finish
+        encode_seconds = 0.0
+        
+        # finish() concatenates the partial movies into the final video
+        def timed_finish(*args, **kwargs):
+            nonlocal encode_seconds
+            start = time.perf_counter()
+            finish(*args, **kwargs)
+            encode_seconds = time.perf_counter() - start
+        
+        file_writer.finish = timed_finish
+        play = scene.play
+        animations_done = 0
+        
+        # wait() goes through play() too, so every animation reports progress,
+        # with its finished partial movie for segmented output
+        def play_with_progress(*args, **kwargs):
+            nonlocal animations_done
+            play(*args, **kwargs)
+            animations_done += 1
+            partial_movie_files = getattr(file_writer, "partial_movie_files", None)
+            report({
+                "scene": scene_name,
+                "animation_index": animations_done,
+                "frames_done": int(getattr(scene.renderer, "time", 0) * config.frame_rate),
+                "partial_movie_file": str(partial_movie_files[-1]) if partial_movie_files and partial_movie_files[-1] else None
+            })
+        
+        scene.play = play_with_progress
+        start = time.perf_counter()
+        scene.render()
+        metrics.observe("frame_render", time.perf_counter() - start - encode_seconds)
+        metrics.observe("encode", encode_seconds)
+        if request.get("last_frame"):
+            return str(scene.renderer.file_writer.image_file_path)
+        return str(scene.renderer.file_writer.movie_file_path)
+
+
+def _render_request(request: Dict[str, Any], report: Callable[[Dict[str, Any]], None]) -> Dict[str, str]:
+    """Execute the code once and render each requested scene from it.
+
+    Module-level changes to manim's config apply to this request's scenes,
+    as they would in a CLI render, and are undone afterwards so they can't
+    leak into the renderer's later requests.
+    """
+    from manim import tempconfig
+
+    module_name = request["module_name"]
+    module = types.ModuleType(module_name)
+    with tempconfig({}):
+        with metrics.timed("scene_exec"):
+            exec(compile(request["code"], f"{module_name}.py", "exec"), module.__dict__)
+
+        return {
+            scene_name: _render_scene(module, scene_name, request, report)
+            for scene_name in request["scene_names"]
+        }
+
+
+def _renderer_main(conn) -> None:
+    """Serve render requests from the parent until the pipe is closed."""
+    with metrics.timed("manim_import"):
+        import manim  # noqa: F401  (already imported when preloaded by the forkserver)
+    install_tex_cache_guard()
+
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+
+        try:
+            apply_task_limits()
+            outputs = _render_request(request, lambda progress: conn.send(("progress", progress)))
+            conn.send(("done", outputs, _rss_mb()))
+        except Exception as e:
+            conn.send(("error", f"{str(e)}\n{traceback.format_exc()}", _rss_mb()))
+
+    conn.close()
+
+
+class Renderer:
+    """A single long-lived renderer process with manim already imported."""
+
+    def __init__(self, ctx):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_renderer_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.tasks_done = 0
+        self.rss_mb = 0.0
+        self.dead = False
+
+    def render(self, request: Dict[str, Any], timeout: float,
+               on_progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Tuple[bool, Union[Dict[str, str], str]]:
+        deadline = time.monotonic() + timeout
+        try:
+            self.conn.send(request)
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self.conn.poll(remaining):
+                    self.dead = True
+                    raise TimeoutError("Manim execution timed out")
+                
+                message = self.conn.recv()
+                if message[0] != "progress":
+                    break
+                if on_progress:
+                    on_progress(message[1])
+            
+            status, output, self.rss_mb = message
+        except (EOFError, BrokenPipeError, ConnectionResetError):
+            self.dead = True
+            return False, f"Renderer process exited unexpectedly (exit code {self.process.exitcode})"
+
+        self.tasks_done += 1
+        return status == "done", output
+
+    def should_recycle(self) -> bool:
+        return (
+            self.dead
+            or self.tasks_done >= RENDERER_MAX_TASKS
+            or self.rss_mb >= RENDERER_MAX_RSS_MB
+        )
+
+    def close(self) -> None:
+        if self.process.is_alive() and not self.dead:
+            try:
+                self.conn.send(None)
+                self.process.join(timeout=5)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class RendererPool:
+    """Pool of pre-forked renderer processes that reuse one manim import.
+
+    Renderers are forked from a forkserver that has already imported manim,
+    so a task only pays for its own frames. A renderer is replaced after
+    RENDERER_MAX_TASKS renders, once its peak RSS passes RENDERER_MAX_RSS_MB,
+    or when it times out or dies (including being killed by its rlimits).
+    """
+
+    def __init__(self, size: int):
+        self.ctx = multiprocessing.get_context("forkserver")
+        self.ctx.set_forkserver_preload(["manim"])
+        self.idle: Queue = Queue()
+        for _ in range(size):
+            self.idle.put(Renderer(self.ctx))
+
+    def render(self, code: str, scene_names: List[str], media_dir: str, quality: str,
+               timeout: float, last_frame: bool = False,
+               on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+               config: Optional[Dict[str, Any]] = None) -> Tuple[bool, Union[Dict[str, str], str]]:
+        """Render scenes from one module in a single renderer.
+        
+        Returns (success, {scene name: video or last-frame path}, or an error
+        message). config holds extra manim config options, e.g. the shared
+        cache directories. The timeout covers all scenes together.
+        """
+        request = {
+            "code": code,
+            "scene_names": scene_names,
+            "media_dir": media_dir,
+            "quality": quality,
+            "last_frame": last_frame,
+            "config": config,
+            "module_name": f"scene_{uuid.uuid4().hex}",
+        }
+
+        renderer = self.idle.get()
+        try:
+            return renderer.render(request, timeout, on_progress)
+        finally:
+            if renderer.should_recycle():
+                renderer.close()
+                renderer = Renderer(self.ctx)
+            self.idle.put(renderer)
+
+    def close(self) -> None:
+        while not self.idle.empty():
+            self.idle.get().close()
+
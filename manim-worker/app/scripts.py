@@ -0,0 +1,237 @@
+"""Server-side Lua scripts for task state transitions.
+
+Each script validates the transition against ALLOWED_TRANSITIONS, writes the
+task and publishes the update on the task channel in a single round trip, so
+concurrent updates can't overwrite each other.
+"""
+from .models import TaskStatus
+
+
+ALLOWED_TRANSITIONS = {
+    TaskStatus.PENDING: [TaskStatus.PROCESSING, TaskStatus.COMPLETED, TaskStatus.FAILED],
+    TaskStatus.PROCESSING: [TaskStatus.PROCESSING, TaskStatus.PENDING, TaskStatus.COMPLETED, TaskStatus.FAILED],
+    TaskStatus.COMPLETED: [],
+    TaskStatus.FAILED: [],
+}
+
+
+def _allowed_table() -> str:
+    rows = []
+    for status, targets in ALLOWED_TRANSITIONS.items():
+        entries = ", ".join(f"['{target.value}'] = true" for target in targets)
+        rows.append(f"['{status.value}'] = {{{entries}}}")
+    return "local allowed = {" + ", ".join(rows) + "}\n"
+
+
+# KEYS: task hash
+# ARGV: task id, new status, result json or '', error or '', channel, ttl
+# Returns 1 on success, 0 if the task is missing, -1 if the transition is not allowed
+TRANSITION = _allowed_table() + """
+local current = redis.call('HGET', KEYS[1], 'status')
+if not current then return 0 end
+if not allowed[current][ARGV[2]] then return -1 end
+redis.call('HSET', KEYS[1], 'status', ARGV[2])
+if ARGV[3] ~= '' then redis.call('HSET', KEYS[1], 'result', ARGV[3]) end
+if ARGV[4] ~= '' then redis.call('HSET', KEYS[1], 'error', ARGV[4]) end
+redis.call('EXPIRE', KEYS[1], ARGV[6])
+redis.call('PUBLISH', ARGV[5], cjson.encode({type = 'status_update', task_id = ARGV[1], status = ARGV[2]}))
+return 1
+"""
+
+# Scheduling layout: each (priority, tenant) pair has its own FIFO sub-queue,
+# and each priority keeps a ring of the tenants whose sub-queue is non-empty.
+# Workers block on the signal list (one token per queued task) and then run
+# CLAIM_NEXT, which serves priorities strictly in order and rotates through the
+# ring, giving each tenant up to its weight of tasks per turn. Every step is
+# O(1) in the number of tasks and tenants. Sub-queue keys are derived inside
+# the scripts from the tenant ring, so this layout assumes a single Redis node.
+
+# KEYS: sub-queue, tenant ring, signal list, pending counter
+# ARGV: task id, tenant, '1' to push at the head of the sub-queue
+ENQUEUE = """
+local length
+if ARGV[3] == '1' then
+    length = redis.call('LPUSH', KEYS[1], ARGV[1])
+else
+    length = redis.call('RPUSH', KEYS[1], ARGV[1])
+end
+if length == 1 then redis.call('RPUSH', KEYS[2], ARGV[2]) end
+redis.call('LPUSH', KEYS[3], 'task')
+redis.call('INCR', KEYS[4])
+return length
+"""
+
+# KEYS: in-flight set, pending counter, tenant weights
+# ARGV: channel, processing list or '', worker id, visibility deadline,
+#       sub-queue prefix, ring prefix, credits prefix, task prefix, code prefix, priorities...
+# Returns the claimed task's fields (HGETALL) plus its code from the shared
+# code key, or nil if nothing is queued
+CLAIM_NEXT = _allowed_table() + """
+local function pop_fair(priority)
+    local ring = ARGV[6] .. ':' .. priority
+    local credits = ARGV[7] .. ':' .. priority
+    local tenant = redis.call('LINDEX', ring, 0)
+    while tenant do
+        local subqueue = ARGV[5] .. ':' .. priority .. ':' .. tenant
+        local task_id = redis.call('LPOP', subqueue)
+        if redis.call('LLEN', subqueue) == 0 then
+            redis.call('LPOP', ring)
+            redis.call('HDEL', credits, tenant)
+        elseif redis.call('HINCRBY', credits, tenant, 1) >= (tonumber(redis.call('HGET', KEYS[3], tenant)) or 1) then
+            redis.call('LMOVE', ring, ring, 'LEFT', 'RIGHT')
+            redis.call('HDEL', credits, tenant)
+        end
+        if task_id then return task_id end
+        tenant = redis.call('LINDEX', ring, 0)
+    end
+    return nil
+end
+
+local function next_task()
+    for i = 10, #ARGV do
+        local task_id = pop_fair(ARGV[i])
+        if task_id then return task_id end
+    end
+    return nil
+end
+
+local task_id = next_task()
+while task_id do
+    redis.call('DECR', KEYS[2])
+    local key = ARGV[8] .. ':' .. task_id
+    local current = redis.call('HGET', key, 'status')
+    if current and allowed[current]['processing'] then
+        redis.call('HSET', key, 'status', 'processing')
+        if ARGV[2] ~= '' then
+            redis.call('LPUSH', ARGV[2], task_id)
+            redis.call('ZADD', KEYS[1], ARGV[4], ARGV[3] .. ':' .. task_id)
+        end
+        redis.call('PUBLISH', ARGV[1], cjson.encode({type = 'status_update', task_id = task_id, status = 'processing'}))
+        local fields = redis.call('HGETALL', key)
+        local code_hash = redis.call('HGET', key, 'code_hash')
+        if code_hash then
+            table.insert(fields, 'code')
+            table.insert(fields, redis.call('GET', ARGV[9] .. ':' .. code_hash) or '')
+        end
+        return fields
+    end
+    task_id = next_task()
+end
+return nil
+"""
+
+# KEYS: signal list, pending counter
+# Tops the signal list up to the number of queued tasks, e.g. after a worker
+# died between taking a token and claiming its task
+REPAIR_SIGNALS = """
+local missing = (tonumber(redis.call('GET', KEYS[2])) or 0) - redis.call('LLEN', KEYS[1])
+for i = 1, missing do redis.call('LPUSH', KEYS[1], 'task') end
+return math.max(missing, 0)
+"""
+
+# KEYS: task hash
+# ARGV: task id, progress json, channel
+# Returns 1 on success, 0 if the task is missing, -1 if it is not processing
+PROGRESS = """
+local current = redis.call('HGET', KEYS[1], 'status')
+if not current then return 0 end
+if current ~= 'processing' then return -1 end
+redis.call('HSET', KEYS[1], 'progress', ARGV[2])
+redis.call('PUBLISH', ARGV[3], cjson.encode({type = 'progress', task_id = ARGV[1], progress = cjson.decode(ARGV[2])}))
+return 1
+"""
+
+# KEYS: task hash
+# ARGV: task id, result fields json, channel, ttl
+# Returns the merged result json, or nil if the task is missing
+MERGE_RESULT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return nil end
+local raw = redis.call('HGET', KEYS[1], 'result')
+local result = {}
+if raw then result = cjson.decode(raw) end
+for name, value in pairs(cjson.decode(ARGV[2])) do result[name] = value end
+local merged = cjson.encode(result)
+redis.call('HSET', KEYS[1], 'result', merged)
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+redis.call('PUBLISH', ARGV[3], cjson.encode({type = 'result_update', task_id = ARGV[1], result = result}))
+return merged
+"""
+
+# KEYS: processing list, task hash, in-flight set, sub-queue, tenant ring, signal list, pending counter
+# ARGV: task id, in-flight member, max retries, error message, channel, tenant
+# Returns the new status, or nil if another reaper already recovered the task
+RECOVER = """
+redis.call('ZREM', KEYS[3], ARGV[2])
+if redis.call('LREM', KEYS[1], 1, ARGV[1]) == 0 then return nil end
+if redis.call('EXISTS', KEYS[2]) == 0 then return nil end
+local status = 'pending'
+if redis.call('HINCRBY', KEYS[2], 'attempts', 1) > tonumber(ARGV[3]) then
+    status = 'failed'
+    redis.call('HSET', KEYS[2], 'status', status, 'error', ARGV[4])
+else
+    redis.call('HSET', KEYS[2], 'status', status)
+    -- Back to the head of its tenant's sub-queue so the retry isn't penalized
+    if redis.call('LPUSH', KEYS[4], ARGV[1]) == 1 then redis.call('RPUSH', KEYS[5], ARGV[6]) end
+    redis.call('LPUSH', KEYS[6], 'task')
+    redis.call('INCR', KEYS[7])
+end
+redis.call('PUBLISH', ARGV[5], cjson.encode({type = 'status_update', task_id = ARGV[1], status = status}))
+return status
+"""
+
+# KEYS: webhook retry set, webhook stream
+# ARGV: now, max entries to move, stream maxlen
+# Moves retries whose backoff has elapsed back onto the stream; returns how many
+PROMOTE_WEBHOOK_RETRIES = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, member in ipairs(due) do
+    local entry = cjson.decode(member)
+    redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[3], '*',
+        'url', entry.url, 'payload', entry.payload, 'attempts', entry.attempts)
+    redis.call('ZREM', KEYS[1], member)
+end
+return #due
+"""
+
+# KEYS: pending counter, tenant rate bucket
+# ARGV: max queue depth (0 = no cap), tokens per second (0 = no limit), burst, now, cost
+# Returns {retry-after ms, reason, pending}; reason is '' when admitted. A full
+# queue returns -1 ms and leaves the estimate to the caller. Admitting takes
+# the tokens; a cost above the burst is admitted with a full bucket and
+# leaves it in debt.
+ADMIT = """
+local pending = tonumber(redis.call('GET', KEYS[1])) or 0
+local cost = tonumber(ARGV[5])
+local max_depth = tonumber(ARGV[1])
+if max_depth > 0 and pending + cost > max_depth then
+    return {-1, 'queue_full', pending}
+end
+local rate = tonumber(ARGV[2])
+if rate > 0 then
+    local burst = tonumber(ARGV[3])
+    local now = tonumber(ARGV[4])
+    local bucket = redis.call('HMGET', KEYS[2], 'tokens', 'ts')
+    local tokens = tonumber(bucket[1]) or burst
+    local last = tonumber(bucket[2]) or now
+    tokens = math.min(burst, tokens + math.max(now - last, 0) * rate)
+    local needed = math.min(cost, burst)
+    if tokens < needed then
+        return {math.ceil((needed - tokens) / rate * 1000), 'rate_limited', pending}
+    end
+    redis.call('HSET', KEYS[2], 'tokens', tostring(tokens - cost), 'ts', tostring(now))
+    redis.call('EXPIRE', KEYS[2], math.ceil((burst + cost) / rate) + 1)
+end
+return {0, '', pending}
+"""
+
+# KEYS: service stats hash
+# ARGV: task service time in seconds, smoothing factor
+# Folds one sample into the exponentially weighted moving average
+RECORD_SERVICE_TIME = """
+local value = tonumber(ARGV[1])
+local average = tonumber(redis.call('HGET', KEYS[1], 'ewma'))
+if average then value = average + tonumber(ARGV[2]) * (value - average) end
+redis.call('HSET', KEYS[1], 'ewma', tostring(value))
+redis.call('HINCRBY', KEYS[1], 'samples', 1)
+return tostring(value)
+"""
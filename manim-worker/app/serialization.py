@@ -0,0 +1,22 @@
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+
+def dumps(value: Any) -> str:
+    """Encode task fields, results and events as compact JSON.
+
+    orjson, when installed, is several times faster than the json module;
+    both write plain JSON, so the Lua scripts (cjson) read either.
+    """
+    if orjson:
+        return orjson.dumps(value).decode()
+    return json.dumps(value, separators=(",", ":"))
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    return orjson.loads(data) if orjson else json.loads(data)
@@ -0,0 +1,131 @@
+import os
+import time
+import uuid
+import shutil
+import logging
+from typing import Optional, Tuple
+
+from .config import (
+    ARTIFACT_STORE,
+    PREVIEW_ARTIFACT_STORE,
+    ARTIFACT_DIR,
+    ARTIFACT_BASE_URL,
+    ARTIFACT_TTL,
+    S3_STREAM_UPLOAD
+)
+from .utils import upload_to_s3, upload_video_streamed, s3_object_url
+
+
+logger = logging.getLogger("manim-storage")
+
+
+def artifact_key(file_path: str) -> str:
+    return f"videos/{uuid.uuid4().hex}_{os.path.basename(file_path)}"
+
+
+class ArtifactStore:
+    """Destination for rendered videos, frames and HLS segments.
+
+    put() stores a file under a key (a fresh unique one by default) and
+    returns (success, URL clients fetch it from, or an error message).
+    """
+
+    def put(self, file_path: str, key: Optional[str] = None, content_type: str = "video/mp4",
+            cache_control: Optional[str] = None) -> Tuple[bool, str]:
+        raise NotImplementedError
+
+    def put_video(self, file_path: str) -> Tuple[bool, str]:
+        """Store a finished video, however this store delivers them best."""
+        return self.put(file_path)
+
+    def url(self, key: str) -> str:
+        raise NotImplementedError
+
+
+class S3Store(ArtifactStore):
+    def put(self, file_path: str, key: Optional[str] = None, content_type: str = "video/mp4",
+            cache_control: Optional[str] = None) -> Tuple[bool, str]:
+        return upload_to_s3(file_path, content_type=content_type, s3_key=key, cache_control=cache_control)
+
+    def put_video(self, file_path: str) -> Tuple[bool, str]:
+        if S3_STREAM_UPLOAD:
+            return upload_video_streamed(file_path)
+        return self.put(file_path)
+
+    def url(self, key: str) -> str:
+        return s3_object_url(key)
+
+
+class LocalStore(ArtifactStore):
+    """Artifacts on a local disk or a volume shared with the API, served at /media/<key>.
+
+    Files are hard-linked into ARTIFACT_DIR when it is on the same
+    filesystem as the render output, and copied otherwise, then renamed into
+    place so a playlist being rewritten is never served half-written.
+    """
+
+    def __init__(self, root: str, base_url: str):
+        self.root = root
+        self.base_url = base_url.rstrip("/")
+
+    def path(self, key: str) -> Optional[str]:
+        """File path for a key, or None if the key points outside the store."""
+        path = os.path.realpath(os.path.join(self.root, key))
+        if os.path.commonpath([path, os.path.realpath(self.root)]) != os.path.realpath(self.root):
+            return None
+        return path
+
+    def put(self, file_path: str, key: Optional[str] = None, content_type: str = "video/mp4",
+            cache_control: Optional[str] = None) -> Tuple[bool, str]:
+        key = key or artifact_key(file_path)
+        path = self.path(key)
+        if not path:
+            return False, f"Invalid artifact key {key}"
+
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            try:
+                os.link(file_path, temp_path)
+            except OSError:
+                shutil.copyfile(file_path, temp_path)
+            os.replace(temp_path, path)
+        except OSError as e:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False, f"Failed to store artifact: {str(e)}"
+
+        return True, self.url(key)
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/media/{key}"
+
+    def prune(self, max_age: float = ARTIFACT_TTL) -> int:
+        """Remove artifacts older than max_age seconds; returns how many."""
+        cutoff = time.time() - max_age
+        removed = 0
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                path = os.path.join(directory, name)
+                try:
+                    if os.stat(path).st_mtime < cutoff:
+                        os.remove(path)
+                        removed += 1
+                except OSError:
+                    pass
+        if removed:
+            logger.info(f"Pruned {removed} artifacts from {self.root}")
+        return removed
+
+
+def make_store(name: str) -> ArtifactStore:
+    if name == "local":
+        return LocalStore(ARTIFACT_DIR, ARTIFACT_BASE_URL)
+    if name == "s3":
+        return S3Store()
+    raise ValueError(f"Unknown artifact store {name!r}")
+
+
+artifact_store = make_store(ARTIFACT_STORE)
+# Previews are usually watched once, right after rendering; e.g. keep them local while finals go to S3
+preview_store = artifact_store if PREVIEW_ARTIFACT_STORE == ARTIFACT_STORE else make_store(PREVIEW_ARTIFACT_STORE)
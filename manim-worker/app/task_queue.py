@@ -1,17 +1,187 @@
 from redis import Redis
+from redis.asyncio import Redis as AsyncRedis, BlockingConnectionPool
 from .config import (
     REDIS_HOST, 
     REDIS_PORT, 
     REDIS_DB, 
     REDIS_PASSWORD,
+    REDIS_POOL_SIZE,
+    REDIS_POOL_TIMEOUT,
     TASK_QUEUE,
-    RESULT_HASH,
-    TASK_CHANNEL
+    SUBQUEUE_PREFIX,
+    TENANT_RING_PREFIX,
+    TENANT_CREDITS_PREFIX,
+    TENANT_WEIGHTS,
+    PENDING_COUNT,
+    DEFAULT_TENANT,
+    TASK_KEY_PREFIX,
+    CODE_KEY_PREFIX,
+    TASK_INDEX,
+    TASK_CHANNEL,
+    TASK_TTL,
+    GROUP_KEY_PREFIX,
+    PROCESSING_QUEUE_PREFIX,
+    WORKER_HEARTBEAT_PREFIX,
+    INFLIGHT_SET,
+    VISIBILITY_TIMEOUT,
+    MAX_TASK_RETRIES,
+    RENDER_QUALITY,
+    RENDER_CACHE_ENABLED,
+    MAX_QUEUE_DEPTH,
+    CLIENT_RATE_LIMIT,
+    CLIENT_RATE_BURST,
+    RATE_LIMIT_PREFIX,
+    SERVICE_STATS,
+    SERVICE_TIME_ALPHA,
+    DEFAULT_SERVICE_TIME,
+    CAPACITY_CACHE_TTL,
+    AUTOSCALE_TARGET_WAIT,
+    AUTOSCALE_MIN_WORKERS,
+    AUTOSCALE_MAX_WORKERS,
+    ANALYSIS_ENABLED,
+    HEAVY_TASK_SECONDS
 )
-from typing import Optional , Dict,Any
+from typing import Optional , Dict,Any, List, Tuple
 import uuid
-from .models import Task,TaskStatus
-import json 
+import time
+import math
+import hashlib
+from .models import Task,TaskStatus,TaskPriority,OutputFormat
+from .analysis import SceneAnalysis, analyze_code
+from .render_cache import RenderCache, AsyncRenderCache, render_cache_key
+from .metrics import WORKERS_KEY, is_live
+from .utils import extract_scene_name
+from .serialization import dumps, loads
+from . import scripts
+
+def task_key(task_id: str) -> str:
+    return f"{TASK_KEY_PREFIX}:{task_id}"
+
+
+def code_key(code_hash: str) -> str:
+    return f"{CODE_KEY_PREFIX}:{code_hash}"
+
+
+def group_key(group_id: str) -> str:
+    return f"{GROUP_KEY_PREFIX}:{group_id}"
+
+
+def subqueue_key(priority: TaskPriority, tenant: Optional[str]) -> str:
+    return f"{SUBQUEUE_PREFIX}:{TaskPriority(priority).value}:{tenant or DEFAULT_TENANT}"
+
+
+def tenant_ring_key(priority: TaskPriority) -> str:
+    return f"{TENANT_RING_PREFIX}:{TaskPriority(priority).value}"
+
+
+def enqueue_script_args(task_id: str, priority: TaskPriority, tenant: Optional[str], front: bool = False) -> list:
+    """Arguments for pipe.eval(scripts.ENQUEUE, ...)."""
+    return [
+        4,
+        subqueue_key(priority, tenant),
+        tenant_ring_key(priority),
+        TASK_QUEUE,
+        PENDING_COUNT,
+        task_id,
+        tenant or DEFAULT_TENANT,
+        "1" if front else "0"
+    ]
+
+
+def new_task(code: str, scene_name: Optional[str] = None, webhook_url: Optional[str] = None,
+             priority: TaskPriority = TaskPriority.DEFAULT, tenant: Optional[str] = None,
+             quality: Optional[str] = None, preview: bool = False, parent_id: Optional[str] = None,
+             scene_names: Optional[List[str]] = None, group_id: Optional[str] = None,
+             analysis: Optional[SceneAnalysis] = None, output: OutputFormat = OutputFormat.MP4,
+             encoder_preset: Optional[str] = None) -> Task:
+    """Build a pending task; analysis is the caller's pre-flight result, or is computed here."""
+    task = Task(
+        id=str(uuid.uuid4()),
+        code=code,
+        code_hash=hashlib.sha256(code.encode("utf-8")).hexdigest(),
+        scene_name=scene_name,
+        scene_names=scene_names,
+        webhook_url=webhook_url,
+        status=TaskStatus.PENDING,
+        priority=priority,
+        tenant=tenant,
+        quality=quality or RENDER_QUALITY,
+        preview=preview,
+        output=output,
+        encoder_preset=encoder_preset,
+        parent_id=parent_id,
+        group_id=group_id,
+        created_at=time.time()
+    )
+    
+    if ANALYSIS_ENABLED:
+        if analysis is None:
+            analysis = analyze_code(code, scene_names or ([scene_name] if scene_name else None), task.quality)
+        task.estimated_seconds = round(analysis.estimated_seconds, 1)
+        task.timeout = round(analysis.timeout(), 1)
+        if not analysis.unbounded_loops:
+            task.animations = analysis.animations
+        # Keep long renders from holding up short ones the caller didn't ask to deprioritize
+        if task.priority == TaskPriority.DEFAULT and analysis.estimated_seconds > HEAVY_TASK_SECONDS:
+            task.priority = TaskPriority.BATCH
+    
+    if RENDER_CACHE_ENABLED:
+        if scene_names:
+            # Distinct from any single-scene key, since the cached result holds every video
+            scene_key = ",".join(scene_names)
+        else:
+            scene_key = scene_name or extract_scene_name(code)
+        task.cache_key = render_cache_key(code, scene_key, task.quality, OutputFormat(task.output).value)
+    
+    return task
+
+
+def estimate_wait(position: int, capacity: Dict[str, float]) -> float:
+    """Seconds until a task at this queue position finishes, if workers keep their average pace."""
+    return math.ceil(position / max(capacity["workers"], 1)) * capacity["service_time"]
+
+
+def desired_workers(capacity: Dict[str, float]) -> int:
+    """Workers needed to keep the busy ones and drain the backlog within AUTOSCALE_TARGET_WAIT."""
+    backlog = math.ceil(capacity["pending"] * capacity["service_time"] / AUTOSCALE_TARGET_WAIT)
+    return max(AUTOSCALE_MIN_WORKERS, min(AUTOSCALE_MAX_WORKERS, capacity["busy"] + backlog))
+
+
+def complete_from_cache(task: Task, cached: Dict[str, Any]) -> None:
+    """Identical scene was rendered before, complete without queueing."""
+    task.status = TaskStatus.COMPLETED
+    task.result = {**cached, "cached": True}
+
+
+def queue_task_writes(pipe, task: Task, store_code: bool = True) -> None:
+    """Queue the commands that store a new task and, if it is pending, enqueue it.
+    
+    Works on both sync and asyncio pipelines, so the API and workers share one layout.
+    The code goes to a key named by its hash, so tasks with the same source
+    share one copy and status reads never load it; each new task refreshes
+    its TTL. store_code=False skips the write when the pipeline already has it.
+    """
+    if store_code:
+        pipe.set(code_key(task.code_hash), task.code, ex=TASK_TTL)
+    
+    key = task_key(task.id)
+    pipe.hset(key, mapping=task.to_redis())
+    pipe.expire(key, TASK_TTL)
+    pipe.zadd(TASK_INDEX, {task.id: task.created_at})
+    
+    if task.status == TaskStatus.PENDING:
+        pipe.eval(scripts.ENQUEUE, *enqueue_script_args(task.id, task.priority, task.tenant))
+        pipe.publish(TASK_CHANNEL, dumps({
+            "type": "task_added",
+            "task_id": task.id
+        }))
+    else:
+        pipe.publish(TASK_CHANNEL, dumps({
+            "type": "status_update",
+            "task_id": task.id,
+            "status": task.status
+        }))
+
 
 class RedisQueue:
     def __init__(self):
@@ -22,94 +192,410 @@ class RedisQueue:
             password=REDIS_PASSWORD,
             decode_responses=True
         )
+        self.cache = RenderCache(self.redis)
+        self._transition = self.redis.register_script(scripts.TRANSITION)
+        self._claim_next = self.redis.register_script(scripts.CLAIM_NEXT)
+        self._repair_signals = self.redis.register_script(scripts.REPAIR_SIGNALS)
+        self._progress = self.redis.register_script(scripts.PROGRESS)
+        self._merge_result = self.redis.register_script(scripts.MERGE_RESULT)
+        self._recover = self.redis.register_script(scripts.RECOVER)
+        self._record_service_time = self.redis.register_script(scripts.RECORD_SERVICE_TIME)
         
-    def enqueue_task(self,code:str,scene_name:Optional[str] = None,webhook_url:Optional[str] = None) -> str:
-        task_id = str(uuid.uuid4())
+    def enqueue_task(self,code:str,scene_name:Optional[str] = None,webhook_url:Optional[str] = None,
+                     **options) -> str:
+        task = new_task(code, scene_name, webhook_url, **options)
         
-        task = Task(
-                id=task_id,
-                code = code,
-                scene_name= scene_name,
-                webhook_url=webhook_url,
-                status= TaskStatus.PENDING
-            )
+        if task.cache_key:
+            cached = self.cache.get(task.cache_key)
+            if cached:
+                complete_from_cache(task, cached)
         
-        self.redis.hset(RESULT_HASH,task_id,task.to_json())
-        self.redis.lpush(TASK_QUEUE,task_id)
+        pipe = self.redis.pipeline()
+        queue_task_writes(pipe, task)
+        pipe.execute()
         
-        self.redis.publish(TASK_CHANNEL, json.dumps({
-            "type": "task_added",
-            "task_id": task_id
-        }))
-        
-        return task_id
-    
+        return task.id
     
     def get_task(self,task_id:str) -> Optional[Task]:
-        task_json = self.redis.hget(RESULT_HASH,task_id)
+        fields = self.redis.hgetall(task_key(task_id))
         
-        if task_id:
-            return Task.from_json(task_json)
+        if fields:
+            return Task.from_redis(fields)
         
         return None
+    
+    def list_tasks(self, limit: int = 50, offset: int = 0) -> List[Task]:
+        """List retained tasks, newest first."""
+        task_ids = self.redis.zrevrange(TASK_INDEX, offset, offset + limit - 1)
+        
+        pipe = self.redis.pipeline(transaction=False)
+        for task_id in task_ids:
+            pipe.hgetall(task_key(task_id))
+        
+        return [Task.from_redis(fields) for fields in pipe.execute() if fields]
         
+    def _claim(self, worker_id: Optional[str] = None) -> Optional[Task]:
+        """Pop the next task by priority and tenant fair-share and mark it processing.
+        
+        With a worker id the task is also moved into that worker's processing
+        list and given a visibility deadline, in the same script.
+        """
+        fields = self._claim_next(
+            keys=[INFLIGHT_SET, PENDING_COUNT, TENANT_WEIGHTS],
+            args=[
+                TASK_CHANNEL,
+                self._processing_key(worker_id) if worker_id else "",
+                worker_id or "",
+                time.time() + VISIBILITY_TIMEOUT,
+                SUBQUEUE_PREFIX,
+                TENANT_RING_PREFIX,
+                TENANT_CREDITS_PREFIX,
+                TASK_KEY_PREFIX,
+                CODE_KEY_PREFIX,
+                *[priority.value for priority in TaskPriority]
+            ]
+        )
+        if fields:
+            return Task.from_redis(dict(zip(fields[::2], fields[1::2])))
+        return None
+    
     def get_next_task(self) -> Optional[Task]:
-        task_id = self.redis.rpop(TASK_QUEUE)
-        if task_id:
-            task_json = self.redis.hget(RESULT_HASH,task_id)
-            if task_json:
-                return Task.from_json(task_json)
+        if self.redis.rpop(TASK_QUEUE):
+            return self._claim()
         return None
     
     def wait_for_task(self,timeout: int = 0) -> Optional[Task]:
-        result = self.redis.brpop(TASK_QUEUE,timeout)
-        if result:
-            _,task_id = result
-            task_json = self.redis.hget(RESULT_HASH, task_id)
-            if task_json:
-                return Task.from_json(task_json)
+        if self.redis.brpop(TASK_QUEUE,timeout):
+            return self._claim()
         return None
     
+    def claim_task(self, worker_id: str, timeout: int = 0) -> Optional[Task]:
+        """Claim the next task into this worker's processing list and start its visibility timer."""
+        self.heartbeat(worker_id)
+        
+        if self.redis.brpop(TASK_QUEUE, timeout):
+            return self._claim(worker_id)
+        return None
+    
+    def repair_signals(self) -> int:
+        """Re-issue wake-up tokens lost when a worker died between taking a token and claiming."""
+        return self._repair_signals(keys=[TASK_QUEUE, PENDING_COUNT])
+    
+    def set_tenant_weight(self, tenant: str, weight: int) -> None:
+        """Let a tenant take up to `weight` tasks per round-robin turn."""
+        self.redis.hset(TENANT_WEIGHTS, tenant, weight)
+    
+    def heartbeat(self, worker_id: str, task_id: Optional[str] = None) -> None:
+        """Mark the worker alive and push back the visibility timeout of its current task."""
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.set(f"{WORKER_HEARTBEAT_PREFIX}:{worker_id}", time.time(), ex=VISIBILITY_TIMEOUT)
+        if task_id:
+            pipe.zadd(INFLIGHT_SET, {f"{worker_id}:{task_id}": time.time() + VISIBILITY_TIMEOUT}, xx=True)
+        pipe.execute()
+    
+    def ack_task(self, worker_id: str, task_id: str) -> None:
+        """Drop a finished task from the worker's processing list."""
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.lrem(self._processing_key(worker_id), 1, task_id)
+        pipe.zrem(INFLIGHT_SET, f"{worker_id}:{task_id}")
+        pipe.execute()
+    
+    def reap_stalled_tasks(self) -> int:
+        """Re-enqueue tasks whose visibility timeout lapsed or whose worker is gone.
+        
+        Returns the number of tasks recovered (re-enqueued or failed for good).
+        """
+        reaped = 0
+        
+        for member in self.redis.zrangebyscore(INFLIGHT_SET, "-inf", time.time()):
+            worker_id, task_id = member.rsplit(":", 1)
+            reaped += self._recover_task(worker_id, task_id)
+        
+        for processing_key in self.redis.scan_iter(match=f"{PROCESSING_QUEUE_PREFIX}:*"):
+            worker_id = processing_key[len(PROCESSING_QUEUE_PREFIX) + 1:]
+            if self.redis.exists(f"{WORKER_HEARTBEAT_PREFIX}:{worker_id}"):
+                continue
+            for task_id in self.redis.lrange(processing_key, 0, -1):
+                reaped += self._recover_task(worker_id, task_id)
+        
+        return reaped
+    
+    def _recover_task(self, worker_id: str, task_id: str) -> int:
+        priority, tenant = self.redis.hmget(task_key(task_id), "priority", "tenant")
+        priority = priority or TaskPriority.DEFAULT
+        
+        status = self._recover(
+            keys=[
+                self._processing_key(worker_id),
+                task_key(task_id),
+                INFLIGHT_SET,
+                subqueue_key(priority, tenant),
+                tenant_ring_key(priority),
+                TASK_QUEUE,
+                PENDING_COUNT
+            ],
+            args=[
+                task_id,
+                f"{worker_id}:{task_id}",
+                MAX_TASK_RETRIES,
+                f"Task abandoned after {MAX_TASK_RETRIES} retries (worker {worker_id} stopped responding)",
+                TASK_CHANNEL,
+                tenant or DEFAULT_TENANT
+            ]
+        )
+        return 1 if status else 0
+    
+    def _processing_key(self, worker_id: str) -> str:
+        return f"{PROCESSING_QUEUE_PREFIX}:{worker_id}"
+    
     def update_task_status(self, task_id: str, status: TaskStatus, 
                            result: Optional[Dict[str, Any]] = None, 
                            error: Optional[str] = None) -> bool:
+        """Apply a state transition; returns False if the task is missing or the transition is not allowed."""
+        applied = self._transition(
+            keys=[task_key(task_id)],
+            args=[
+                task_id,
+                TaskStatus(status).value,
+                dumps(result) if result is not None else "",
+                error if error is not None else "",
+                TASK_CHANNEL,
+                TASK_TTL
+            ]
+        )
+        return applied == 1
+    
+    def update_task_progress(self, task_id: str, progress: Dict[str, Any]) -> bool:
+        """Record render progress on a processing task and publish it."""
+        applied = self._progress(
+            keys=[task_key(task_id)],
+            args=[task_id, dumps(progress), TASK_CHANNEL]
+        )
+        return applied == 1
+    
+    def merge_task_result(self, task_id: str, result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Add fields to a task's result without changing its status; returns the merged result."""
+        merged = self._merge_result(
+            keys=[task_key(task_id)],
+            args=[task_id, dumps(result), TASK_CHANNEL, TASK_TTL]
+        )
+        return loads(merged) if merged else None
+    
+    def pending_count(self) -> int:
+        """Tasks waiting to be claimed."""
+        return int(self.redis.get(PENDING_COUNT) or 0)
+    
+    def record_service_time(self, seconds: float) -> None:
+        """Fold a finished task's service time into the rolling average used for ETAs."""
+        self._record_service_time(keys=[SERVICE_STATS], args=[seconds, SERVICE_TIME_ALPHA])
+    
+    def prune_task_index(self) -> int:
+        """Drop index entries of tasks created more than TASK_TTL ago, whose hashes have expired."""
+        return self.redis.zremrangebyscore(TASK_INDEX, "-inf", time.time() - TASK_TTL)
+    
+    def clean_old_tasks(self, max_tasks: int = 1000, batch_size: int = 500) -> int:
+        """Trim the task index to the newest max_tasks tasks, oldest first.
+        
+        Task hashes also expire on their own after TASK_TTL; this only prunes
+        their index entries and enforces the count bound. Unlike the reaper's
+        prune_task_index(), this deletes tasks that may still be queued.
+        """
+        self.prune_task_index()
+        
+        removed = 0
+        while True:
+            excess = self.redis.zcard(TASK_INDEX) - max_tasks
+            if excess <= 0:
+                return removed
+            
+            oldest = self.redis.zpopmin(TASK_INDEX, min(excess, batch_size))
+            if not oldest:
+                return removed
+            
+            self.redis.unlink(*[task_key(task_id) for task_id, _ in oldest])
+            removed += len(oldest)
+    
+    
+class AsyncRedisQueue:
+    """asyncio client for the API process.
+    
+    Shares the key layout with RedisQueue but never blocks the event loop;
+    workers keep using the blocking client.
+    """
+    
+    def __init__(self):
+        self.redis = AsyncRedis(connection_pool=BlockingConnectionPool(
+            host=REDIS_HOST,
+            port=REDIS_PORT,
+            db=REDIS_DB,
+            password=REDIS_PASSWORD,
+            decode_responses=True,
+            max_connections=REDIS_POOL_SIZE,
+            timeout=REDIS_POOL_TIMEOUT
+        ))
+        self.cache = AsyncRenderCache(self.redis)
+        self._admit = self.redis.register_script(scripts.ADMIT)
+        self._workers: Tuple[float, int, int, float] = (0.0, 0, 0, DEFAULT_SERVICE_TIME)
+    
+    async def admit(self, client: str, cost: int = 1) -> Tuple[Optional[str], float, int]:
+        """Apply the queue depth cap and the client's rate limit before enqueueing cost tasks.
         
-        task_json = self.redis.hget(RESULT_HASH, task_id)
-        if not task_json:
-            return False
+        Admitting takes the client's rate tokens. Returns (rejection reason or
+        None, seconds to wait before retrying, tasks already pending).
+        """
+        retry_ms, reason, pending = await self._admit(
+            keys=[PENDING_COUNT, f"{RATE_LIMIT_PREFIX}:{client}"],
+            args=[MAX_QUEUE_DEPTH, CLIENT_RATE_LIMIT / 60, CLIENT_RATE_BURST, time.time(), cost]
+        )
+        if not reason:
+            return None, 0.0, pending
         
-        task = Task.from_json(task_json)
-        task.status = status
+        if retry_ms < 0:
+            # Queue is full: wait about as long as the workers need to make room
+            capacity = await self.capacity(pending)
+            excess = pending + cost - MAX_QUEUE_DEPTH
+            return reason, max(1.0, estimate_wait(excess, capacity)), pending
+        return reason, retry_ms / 1000, pending
+    
+    async def capacity(self, pending: Optional[int] = None) -> Dict[str, float]:
+        """Pending tasks, live and busy workers, and the rolling service time.
         
-        if result is not None:
-            task.result = result
+        Worker state and service time change slowly and are cached for
+        CAPACITY_CACHE_TTL seconds; the pending count is read fresh unless the
+        caller already has it.
+        """
+        checked, workers, busy, service_time = self._workers
+        now = time.time()
         
-        if error is not None:
-            task.error = error
+        pipe = self.redis.pipeline(transaction=False)
+        if pending is None:
+            pipe.get(PENDING_COUNT)
+        if now - checked >= CAPACITY_CACHE_TTL:
+            pipe.hvals(WORKERS_KEY)
+            pipe.hget(SERVICE_STATS, "ewma")
+        results = await pipe.execute() if len(pipe) else []
         
-        self.redis.hset(RESULT_HASH, task_id, task.to_json())
+        if pending is None:
+            pending, *refreshed = results
+        else:
+            refreshed = results
         
-        self.redis.publish(TASK_CHANNEL, json.dumps({
-            "type": "status_update",
-            "task_id": task_id,
-            "status": status
-        }))
+        if refreshed:
+            states = [state for state in map(loads, refreshed[0]) if is_live(state, now)]
+            workers = len(states)
+            busy = sum(1 for state in states if state["busy"])
+            service_time = float(refreshed[1]) if refreshed[1] else DEFAULT_SERVICE_TIME
+            self._workers = (now, workers, busy, service_time)
         
-        return True
+        return {
+            "pending": int(pending or 0),
+            "workers": workers,
+            "busy": busy,
+            "service_time": service_time
+        }
     
-    def clean_old_tasks(self, max_tasks: int = 1000) -> int:
-        task_ids = self.redis.hkeys(RESULT_HASH)
+    async def prepare_task(self, code: str, scene_name: Optional[str] = None, webhook_url: Optional[str] = None,
+                           **options) -> Task:
+        """Build a task and complete it from the render cache if possible, without storing it.
         
-        if len(task_ids) <= max_tasks:
-            return 0
+        options are passed to new_task (priority, tenant, quality, ...). The
+        API checks the cache first so cached renders skip admission control.
+        """
+        task = new_task(code, scene_name, webhook_url, **options)
         
-        to_remove = len(task_ids) - max_tasks
-
-        for i in range(to_remove):
-            if i < len(task_ids):
-                self.redis.hdel(RESULT_HASH, task_ids[i])
+        if task.cache_key:
+            cached = await self.cache.get(task.cache_key)
+            if cached:
+                complete_from_cache(task, cached)
+        return task
+    
+    async def store_task(self, task: Task) -> None:
+        """Store a prepared task and enqueue it unless it already completed."""
+        pipe = self.redis.pipeline()
+        queue_task_writes(pipe, task)
+        await pipe.execute()
+    
+    async def enqueue_task(self, code: str, scene_name: Optional[str] = None, webhook_url: Optional[str] = None,
+                           **options) -> str:
+        """Store and enqueue a task; options are passed to new_task (priority, tenant, quality, ...)."""
+        task = await self.prepare_task(code, scene_name, webhook_url, **options)
+        await self.store_task(task)
+        return task.id
+    
+    async def prepare_batch(self, items: List[Dict[str, Any]], webhook_url: Optional[str] = None,
+                            **options) -> Tuple[str, List[Task]]:
+        """Build one task per item under a new group id, completing cached ones, without storing them.
+        
+        Each item is a dict with "code", "scene_names" and optionally its
+        pre-flight "analysis"; every scene of an item renders in one worker
+        invocation. Cache lookups take one round trip however many items
+        there are, and store_batch() writes them in another.
+        """
+        group_id = str(uuid.uuid4())
+        tasks = [
+            new_task(item["code"], webhook_url=webhook_url, scene_names=item["scene_names"],
+                     group_id=group_id, analysis=item.get("analysis"), **options)
+            for item in items
+        ]
         
-        return to_remove
+        cache_keys = [task.cache_key for task in tasks if task.cache_key]
+        if cache_keys:
+            cached = await self.cache.get_many(cache_keys)
+            for task in tasks:
+                if task.cache_key and cached[task.cache_key]:
+                    complete_from_cache(task, cached[task.cache_key])
+        return group_id, tasks
+    
+    async def store_batch(self, group_id: str, tasks: List[Task]) -> None:
+        pipe = self.redis.pipeline()
+        stored = set()
+        for task in tasks:
+            queue_task_writes(pipe, task, store_code=task.code_hash not in stored)
+            stored.add(task.code_hash)
+        pipe.rpush(group_key(group_id), *[task.id for task in tasks])
+        pipe.expire(group_key(group_id), TASK_TTL)
+        await pipe.execute()
+    
+    async def enqueue_batch(self, items: List[Dict[str, Any]], webhook_url: Optional[str] = None,
+                            **options) -> Tuple[str, List[str]]:
+        """Store and enqueue one task per item under a new group id; see prepare_batch()."""
+        group_id, tasks = await self.prepare_batch(items, webhook_url, **options)
+        await self.store_batch(group_id, tasks)
+        return group_id, [task.id for task in tasks]
+    
+    async def get_group(self, group_id: str) -> Optional[List[Task]]:
+        """Tasks of a batch in submission order, or None if the group is unknown."""
+        task_ids = await self.redis.lrange(group_key(group_id), 0, -1)
+        if not task_ids:
+            return None
+        
+        pipe = self.redis.pipeline(transaction=False)
+        for task_id in task_ids:
+            pipe.hgetall(task_key(task_id))
+        
+        return [Task.from_redis(fields) for fields in await pipe.execute() if fields]
+    
+    async def get_task(self, task_id: str) -> Optional[Task]:
+        fields = await self.redis.hgetall(task_key(task_id))
+        
+        if fields:
+            return Task.from_redis(fields)
+        
+        return None
+    
+    async def list_tasks(self, limit: int = 50, offset: int = 0) -> List[Task]:
+        """List retained tasks, newest first."""
+        task_ids = await self.redis.zrevrange(TASK_INDEX, offset, offset + limit - 1)
+        
+        pipe = self.redis.pipeline(transaction=False)
+        for task_id in task_ids:
+            pipe.hgetall(task_key(task_id))
+        
+        return [Task.from_redis(fields) for fields in await pipe.execute() if fields]
+    
+    async def close(self) -> None:
+        await self.redis.aclose()
     
     
 queue = RedisQueue()
+async_queue = AsyncRedisQueue()
@@ -1,28 +1,58 @@
 import os
-import re
 import ast
 import uuid
 import boto3
-import requests
+import threading
+import subprocess
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError
-from typing import Optional, Tuple, Dict, Any
-import time
+from typing import Optional, Tuple, List, BinaryIO
 from .config import (
     AWS_ACCESS_KEY_ID,
     AWS_SECRET_ACCESS_KEY,
     AWS_REGION,
     AWS_S3_BUCKET_NAME,
-    TEMP_DIR,
-    WEBHOOK_ENABLED,
-    WEBHOOK_URL
+    S3_ENDPOINT_URL,
+    S3_MAX_POOL_CONNECTIONS,
+    S3_MULTIPART_THRESHOLD_MB,
+    S3_MULTIPART_CHUNKSIZE_MB,
+    S3_MAX_CONCURRENCY
 )
 
 
+def _base_name(base: ast.expr) -> str:
+    if isinstance(base, ast.Attribute):
+        return base.attr
+    return base.id if isinstance(base, ast.Name) else ""
+
+
+def extract_scene_names(code: str) -> List[str]:
+    """Extract every scene class defined at module level, in source order.
+    
+    A class counts as a scene if it inherits from a manim *Scene class
+    (Scene, MovingCameraScene, ThreeDScene, ...) or from a scene defined
+    earlier in the same code.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return []
+    
+    names = []
+    for node in tree.body:
+        if not isinstance(node, ast.ClassDef):
+            continue
+        bases = [_base_name(base) for base in node.bases]
+        if any(base.endswith("Scene") or base in names for base in bases):
+            names.append(node.name)
+    return names
+
+
 def extract_scene_name(code: str) -> Optional[str]:
-    """Extract the first class name that inherits from Scene from the Manim code."""
-    pattern = r"class\s+(\w+)\s*\(\s*Scene\s*\):"
-    match = re.search(pattern, code)
-    return match.group(1) if match else None
+    """Extract the first scene class name from the Manim code."""
+    names = extract_scene_names(code)
+    return names[0] if names else None
 
 
 def validate_manim_code(code: str) -> Tuple[bool, Optional[str]]:
@@ -34,58 +64,152 @@ def validate_manim_code(code: str) -> Tuple[bool, Optional[str]]:
         error_message = f"Syntax error in provided code: {str(e)} (line {e.lineno})"
         return False, error_message
 
-def create_temp_file(code):
-    """Create a temporary file containing the Manim code."""
-    # Ensure temp directory exists
-    os.makedirs(TEMP_DIR, exist_ok=True)
-    
-    # Create unique filename
-    file_id = str(uuid.uuid4()).replace('-', '')
-    file_path = os.path.join(TEMP_DIR, f"{file_id}.py")
-    
-    # Write file with explicit flush and close
-    with open(file_path, 'w') as f:
-        f.write(code)
-        f.flush()
-        os.fsync(f.fileno())  # Force write to disk
-    
-    # Ensure file is readable and exists before returning
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(f"Failed to create temp file at {file_path}")
-    
-    # Small delay to ensure file system has fully registered the file
-    time.sleep(0.1)
+
+_s3_client = None
+_s3_client_lock = threading.Lock()
+
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=S3_MULTIPART_THRESHOLD_MB * 1024 * 1024,
+    multipart_chunksize=S3_MULTIPART_CHUNKSIZE_MB * 1024 * 1024,
+    max_concurrency=S3_MAX_CONCURRENCY,
+    use_threads=True
+)
+
+
+def get_s3_client():
+    """Return the process-wide S3 client, creating it on first use.
     
-    return file_path
+    boto3 clients are thread-safe once built, so every worker thread shares one
+    client and its connection pool instead of re-resolving credentials and
+    opening new TLS connections per upload.
+    """
+    global _s3_client
+    if _s3_client is None:
+        with _s3_client_lock:
+            if _s3_client is None:
+                _s3_client = boto3.session.Session().client(
+                    's3',
+                    aws_access_key_id=AWS_ACCESS_KEY_ID,
+                    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+                    region_name=AWS_REGION,
+                    endpoint_url=S3_ENDPOINT_URL,
+                    config=Config(
+                        max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+                        retries={"mode": "adaptive", "max_attempts": 5}
+                    )
+                )
+    return _s3_client
+
+
+def s3_object_url(s3_key: str) -> str:
+    if S3_ENDPOINT_URL:
+        return f"{S3_ENDPOINT_URL.rstrip('/')}/{AWS_S3_BUCKET_NAME}/{s3_key}"
+    return f"https://{AWS_S3_BUCKET_NAME}.s3.amazonaws.com/{s3_key}"
 
 
-def upload_to_s3(file_path: str, content_type: str = "video/mp4") -> Tuple[bool, str]:
-    """Upload a file to S3 bucket and return the URL."""
+def upload_to_s3(file_path: str, content_type: str = "video/mp4", s3_key: Optional[str] = None,
+                 cache_control: Optional[str] = None) -> Tuple[bool, str]:
+    """Upload a file to S3 bucket and return the URL; the key defaults to a unique one under videos/."""
     try:
-        s3_client = boto3.client(
-            's3',
-            aws_access_key_id=AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-            region_name=AWS_REGION
+        file_name = os.path.basename(file_path)
+        s3_key = s3_key or f"videos/{uuid.uuid4().hex}_{file_name}"
+        extra_args = {"ContentType": content_type}
+        if cache_control:
+            extra_args["CacheControl"] = cache_control
+        
+        get_s3_client().upload_file(
+            file_path,
+            AWS_S3_BUCKET_NAME,
+            s3_key,
+            ExtraArgs=extra_args,
+            Config=TRANSFER_CONFIG
         )
         
-        file_name = os.path.basename(file_path)
+        return True, s3_object_url(s3_key)
+    
+    except ClientError as e:
+        return False, f"Failed to upload to S3: {str(e)}"
+
+
+def upload_stream_to_s3(stream: BinaryIO, file_name: str, content_type: str = "video/mp4") -> Tuple[bool, str]:
+    """Upload a non-seekable stream to S3 as a multipart upload and return the URL."""
+    try:
         s3_key = f"videos/{uuid.uuid4().hex}_{file_name}"
         
-        s3_client.upload_file(
-            file_path,
+        get_s3_client().upload_fileobj(
+            stream,
             AWS_S3_BUCKET_NAME,
             s3_key,
-            ExtraArgs={"ContentType": content_type}
+            ExtraArgs={"ContentType": content_type},
+            Config=TRANSFER_CONFIG
         )
         
-        s3_url = f"https://{AWS_S3_BUCKET_NAME}.s3.amazonaws.com/{s3_key}"
-        return True, s3_url
+        return True, s3_object_url(s3_key)
     
     except ClientError as e:
         return False, f"Failed to upload to S3: {str(e)}"
 
 
+def upload_ffmpeg_output(ffmpeg_args: List[str], file_name: str, content_type: str = "video/mp4") -> Tuple[bool, str]:
+    """Run ffmpeg writing to stdout and upload its output while it is produced."""
+    process = subprocess.Popen(
+        ["ffmpeg", "-loglevel", "error", *ffmpeg_args, "pipe:1"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+    try:
+        success, result_or_error = upload_stream_to_s3(process.stdout, file_name, content_type)
+    except BaseException:
+        # Don't leave ffmpeg blocked on a full pipe; the upload's error is the one to report
+        process.kill()
+        process.communicate()
+        raise
+    if not success or (process.poll() is None and process.stdout.read(1)):
+        # Upload gave up early; don't leave ffmpeg blocked on a full pipe
+        process.kill()
+    stderr = process.stderr.read().decode(errors="replace")
+    
+    if process.wait() != 0 and success:
+        return False, f"ffmpeg failed: {stderr}"
+    return success, result_or_error
+
+
+def upload_video_streamed(video_path: str) -> Tuple[bool, str]:
+    """Remux a rendered video into fragmented MP4 straight into S3.
+    
+    Fragmented MP4 needs no seekable output, so no second file is written, and
+    players can start before the whole object has downloaded.
+    """
+    return upload_ffmpeg_output(
+        ["-i", video_path, "-c", "copy", "-movflags", "frag_keyframe+empty_moov+default_base_moof", "-f", "mp4"],
+        os.path.basename(video_path)
+    )
+
+
+def concat_videos(video_paths: List[str], output_path: str) -> Tuple[bool, str]:
+    """Join videos encoded with the same settings into one, without re-encoding."""
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    list_path = f"{output_path}.txt"
+    with open(list_path, "w") as f:
+        for video_path in video_paths:
+            escaped = os.path.abspath(video_path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    
+    try:
+        result = subprocess.run(
+            ["ffmpeg", "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", list_path,
+             "-c", "copy", "-movflags", "+faststart", output_path],
+            capture_output=True,
+            text=True
+        )
+    finally:
+        os.remove(list_path)
+    
+    if result.returncode != 0:
+        return False, f"ffmpeg concat failed: {result.stderr}"
+    return True, output_path
+
+
 def cleanup_files(file_paths: list) -> None:
     """Remove temporary files."""
     for file_path in file_paths:
@@ -94,40 +218,3 @@ def cleanup_files(file_paths: list) -> None:
                 os.remove(file_path)
             except Exception:
                 pass
-
-
-def send_webhook_notification(webhook_url: str, data: Dict[str, Any]) -> bool:
-    """Send a webhook notification with the task result."""
-    if not webhook_url:
-        return False
-    
-    try:
-        response = requests.post(
-            webhook_url,
-            json=data,
-            headers={"Content-Type": "application/json"},
-            timeout=10
-        )
-        return response.status_code == 200
-    except Exception:
-        return False
-
-
-def notify_task_completion(task_id: str, status: str, result: Dict[str, Any] = None, 
-                           error: str = None, webhook_url: str = None) -> None:
-    """Send task completion notification via webhook."""
-    if not WEBHOOK_ENABLED and not webhook_url:
-        return
-    
-    url = webhook_url or WEBHOOK_URL
-    if not url:
-        return
-    
-    data = {
-        "task_id": task_id,
-        "status": status,
-        "result": result,
-        "error": error
-    }
-    
-    send_webhook_notification(url, data)
\ No newline at end of file
@@ -0,0 +1,277 @@
+"""Task completion webhooks: `python -m app.webhooks`.
+
+Workers only append completions to a Redis stream; this dispatcher is the
+process that POSTs them, so it must run alongside the workers whenever
+WEBHOOK_ENABLED is set or tasks carry a webhook_url. It needs httpx.
+"""
+import os
+import time
+import socket
+import random
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Optional, Dict, Any, List, Tuple, Set
+from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
+from redis.exceptions import ResponseError
+
+from .config import (
+    REDIS_HOST,
+    REDIS_PORT,
+    REDIS_DB,
+    REDIS_PASSWORD,
+    WEBHOOK_ENABLED,
+    WEBHOOK_URL,
+    WEBHOOK_STREAM,
+    WEBHOOK_GROUP,
+    WEBHOOK_RETRY_SET,
+    WEBHOOK_DEAD_LETTER,
+    WEBHOOK_STREAM_MAXLEN,
+    WEBHOOK_DEAD_LETTER_MAX,
+    WEBHOOK_TIMEOUT,
+    WEBHOOK_MAX_ATTEMPTS,
+    WEBHOOK_BACKOFF_BASE,
+    WEBHOOK_BACKOFF_MAX,
+    WEBHOOK_BATCH_SIZE,
+    WEBHOOK_BATCHING,
+    WEBHOOK_MAX_CONNECTIONS,
+    WEBHOOK_CLAIM_IDLE
+)
+from .metrics import metrics
+from .serialization import dumps, loads
+from . import scripts
+
+
+logger = logging.getLogger("manim-webhooks")
+
+_redis = Redis(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    db=REDIS_DB,
+    password=REDIS_PASSWORD,
+    decode_responses=True
+)
+
+
+def notify_task_completion(task_id: str, status: str, result: Dict[str, Any] = None,
+                           error: str = None, webhook_url: str = None) -> None:
+    """Queue a task completion webhook for the dispatcher; never waits on HTTP."""
+    if not WEBHOOK_ENABLED and not webhook_url:
+        return
+
+    url = webhook_url or WEBHOOK_URL
+    if not url:
+        return
+
+    data = {
+        "task_id": task_id,
+        "status": status,
+        "result": result,
+        "error": error
+    }
+
+    try:
+        _redis.xadd(
+            WEBHOOK_STREAM,
+            {"url": url, "payload": dumps(data), "attempts": 0},
+            maxlen=WEBHOOK_STREAM_MAXLEN,
+            approximate=True
+        )
+    except Exception as e:
+        logger.error(f"Failed to queue webhook for task {task_id}: {str(e)}")
+
+
+def backoff_delay(attempts: int) -> float:
+    """Exponential backoff with jitter, so a recovering endpoint isn't hit by every retry at once."""
+    delay = min(WEBHOOK_BACKOFF_MAX, WEBHOOK_BACKOFF_BASE * 2 ** min(attempts - 1, 16))
+    return delay * random.uniform(0.5, 1)
+
+
+class WebhookDispatcher:
+    """Delivers queued webhooks from WEBHOOK_STREAM over a pooled HTTP client.
+
+    Dispatchers share a consumer group, so several can run side by side, and
+    a dispatcher takes over entries another one left unacknowledged for
+    WEBHOOK_CLAIM_IDLE seconds. Entries for the same endpoint within one read
+    are delivered in order, or as one JSON array with WEBHOOK_BATCHING.
+    Failed deliveries wait in WEBHOOK_RETRY_SET with exponential backoff and
+    go to the WEBHOOK_DEAD_LETTER list after WEBHOOK_MAX_ATTEMPTS.
+    """
+
+    def __init__(self, consumer: str):
+        self.consumer = consumer
+        self.redis = AsyncRedis(
+            host=REDIS_HOST,
+            port=REDIS_PORT,
+            db=REDIS_DB,
+            password=REDIS_PASSWORD,
+            decode_responses=True
+        )
+        self._promote = self.redis.register_script(scripts.PROMOTE_WEBHOOK_RETRIES)
+        self.client = None
+        self.slots = asyncio.Semaphore(WEBHOOK_MAX_CONNECTIONS)
+        self.deliveries: Set[asyncio.Task] = set()
+        # Entries read or claimed by this dispatcher and not yet finished,
+        # including those still waiting for a delivery slot
+        self.in_flight: Set[str] = set()
+
+    async def run(self) -> None:
+        import httpx
+
+        try:
+            await self.redis.xgroup_create(WEBHOOK_STREAM, WEBHOOK_GROUP, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+        limits = httpx.Limits(max_connections=WEBHOOK_MAX_CONNECTIONS, max_keepalive_connections=WEBHOOK_MAX_CONNECTIONS)
+        async with httpx.AsyncClient(timeout=WEBHOOK_TIMEOUT, limits=limits) as client:
+            self.client = client
+            maintenance = asyncio.create_task(self._maintain())
+            try:
+                # Entries left unacknowledged under this consumer name come first. The
+                # default name is per process, so this only finds them when
+                # WEBHOOK_CONSUMER gives the dispatcher a stable name; otherwise other
+                # dispatchers take them over after WEBHOOK_CLAIM_IDLE.
+                await self._dispatch(await self._read("0"))
+                while True:
+                    try:
+                        await self._dispatch(await self._read(">"))
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        logger.error(f"Error reading webhooks: {str(e)}")
+                        await asyncio.sleep(1)
+            finally:
+                maintenance.cancel()
+                if self.deliveries:
+                    await asyncio.gather(*self.deliveries, return_exceptions=True)
+                await self.redis.aclose()
+
+    async def _read(self, stream_id: str) -> List[Tuple[str, Dict[str, str]]]:
+        response = await self.redis.xreadgroup(
+            WEBHOOK_GROUP,
+            self.consumer,
+            {WEBHOOK_STREAM: stream_id},
+            count=WEBHOOK_BATCH_SIZE,
+            block=1000
+        )
+        return [(message_id, fields) for message_id, fields in response[0][1] if fields] if response else []
+
+    async def _maintain(self) -> None:
+        """Promote due retries and take over entries abandoned by stopped dispatchers."""
+        while True:
+            try:
+                await self._promote(
+                    keys=[WEBHOOK_RETRY_SET, WEBHOOK_STREAM],
+                    args=[time.time(), WEBHOOK_BATCH_SIZE, WEBHOOK_STREAM_MAXLEN]
+                )
+                if self.in_flight:
+                    # Entries waiting on a slow endpoint or a free slot must not look abandoned
+                    await self.redis.xclaim(WEBHOOK_STREAM, WEBHOOK_GROUP, self.consumer, min_idle_time=0,
+                                            message_ids=list(self.in_flight), justid=True)
+                _, claimed, *_ = await self.redis.xautoclaim(
+                    WEBHOOK_STREAM,
+                    WEBHOOK_GROUP,
+                    self.consumer,
+                    min_idle_time=WEBHOOK_CLAIM_IDLE * 1000,
+                    count=WEBHOOK_BATCH_SIZE
+                )
+                await self._dispatch([
+                    (message_id, fields) for message_id, fields in claimed
+                    if fields and message_id not in self.in_flight
+                ])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in webhook maintenance: {str(e)}")
+            await asyncio.sleep(1)
+
+    async def _dispatch(self, messages: List[Tuple[str, Dict[str, str]]]) -> None:
+        by_url = defaultdict(list)
+        for message_id, fields in messages:
+            self.in_flight.add(message_id)
+            by_url[fields["url"]].append((message_id, fields))
+
+        for url, entries in by_url.items():
+            # Waits for a free slot, so a slow endpoint applies backpressure to reads
+            await self.slots.acquire()
+            delivery = asyncio.create_task(self._deliver_endpoint(url, entries))
+            self.deliveries.add(delivery)
+            delivery.add_done_callback(self._delivery_done)
+
+    def _delivery_done(self, delivery: asyncio.Task) -> None:
+        self.deliveries.discard(delivery)
+        self.slots.release()
+        if not delivery.cancelled() and delivery.exception():
+            logger.error(f"Webhook delivery crashed: {delivery.exception()}")
+
+    async def _deliver_endpoint(self, url: str, entries: List[Tuple[str, Dict[str, str]]]) -> None:
+        if WEBHOOK_BATCHING and len(entries) > 1:
+            error = await self._post(url, [loads(fields["payload"]) for _, fields in entries])
+            for message_id, fields in entries:
+                await self._finish(message_id, fields, error)
+            return
+
+        for message_id, fields in entries:
+            error = await self._post(url, loads(fields["payload"]))
+            await self._finish(message_id, fields, error)
+
+    async def _post(self, url: str, payload: Any) -> Optional[str]:
+        """POST the payload; returns None on a 2xx response, else the error."""
+        start = time.perf_counter()
+        try:
+            response = await self.client.post(url, content=dumps(payload), headers={"Content-Type": "application/json"})
+            if response.is_success:
+                return None
+            return f"HTTP {response.status_code}"
+        except Exception as e:
+            return f"{type(e).__name__}: {str(e)}"
+        finally:
+            await asyncio.to_thread(metrics.observe, "webhook", time.perf_counter() - start)
+
+    async def _finish(self, message_id: str, fields: Dict[str, str], error: Optional[str]) -> None:
+        """Acknowledge a handled entry, scheduling a retry or dead-lettering it on failure."""
+        attempts = int(fields.get("attempts", 0)) + 1
+        outcome = "delivered"
+
+        pipe = self.redis.pipeline()
+        if error and attempts < WEBHOOK_MAX_ATTEMPTS:
+            outcome = "retried"
+            entry = {"id": message_id, "url": fields["url"], "payload": fields["payload"], "attempts": str(attempts)}
+            pipe.zadd(WEBHOOK_RETRY_SET, {dumps(entry): time.time() + backoff_delay(attempts)})
+        elif error:
+            outcome = "dead"
+            logger.warning(f"Giving up on webhook to {fields['url']} after {attempts} attempts: {error}")
+            pipe.lpush(WEBHOOK_DEAD_LETTER, dumps({
+                "url": fields["url"],
+                "payload": loads(fields["payload"]),
+                "attempts": attempts,
+                "error": error,
+                "failed_at": time.time()
+            }))
+            pipe.ltrim(WEBHOOK_DEAD_LETTER, 0, WEBHOOK_DEAD_LETTER_MAX - 1)
+        pipe.xack(WEBHOOK_STREAM, WEBHOOK_GROUP, message_id)
+        pipe.xdel(WEBHOOK_STREAM, message_id)
+        try:
+            await pipe.execute()
+        finally:
+            # Left unacknowledged, the entry is taken over again once it idles
+            self.in_flight.discard(message_id)
+
+        await asyncio.to_thread(metrics.count, f"webhooks_{outcome}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    
+    # Give each dispatcher its own stable name; two live dispatchers sharing one would redeliver each other's entries
+    dispatcher = WebhookDispatcher(os.getenv("WEBHOOK_CONSUMER") or f"{socket.gethostname()}-{os.getpid()}")
+    try:
+        asyncio.run(dispatcher.run())
+    except KeyboardInterrupt:
+        logger.info("Shutting down webhook dispatcher...")
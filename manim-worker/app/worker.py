@@ -1,23 +1,76 @@
 
 import os
+import glob
+import math
 import time
+import random
+import signal
 import subprocess
 import traceback
 import logging
+import socket
 import argparse
-from threading import Thread
-from task_queue import queue
+import multiprocessing
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread, Event, current_thread
+from .task_queue import queue
 
 
-from models import TaskStatus
-from utils import (
+from .models import TaskStatus, TaskPriority, OutputFormat
+from .utils import (
     extract_scene_name,
-    create_temp_file,
-    upload_to_s3,
-    cleanup_files,
-    notify_task_completion
+    concat_videos,
+    cleanup_files
+)
+from .webhooks import notify_task_completion
+from .renderer_pool import RendererPool
+from .render_cli import cli_command, cli_env
+from .hls import HlsStream
+from .workspace import task_workspace, collect_garbage, WorkspaceError
+from .storage import artifact_store, preview_store, LocalStore
+from .metrics import metrics
+from .media_cache import (
+    partial_movie_dir,
+    locked_dir,
+    touch_used_partials,
+    prune_media_caches,
+    manim_cache_options,
+    prewarm_tex_cache,
+    write_cli_config
+)
+from .limits import (
+    cpu_slice,
+    default_worker_processes,
+    host_render_slots,
+    HOST_CPUS,
+    pin_render_threads
+)
+from .config import (
+    NUM_WORKERS,
+    WORKER_BACKOFF_BASE,
+    WORKER_BACKOFF_MAX,
+    WORKER_PROCESSES,
+    RENDER_QUALITY,
+    QUALITY_DIRS,
+    PREVIEW_QUALITY,
+    PREVIEW_LAST_FRAME,
+    RENDER_TIMEOUT,
+    RENDERER_POOL_ENABLED,
+    PARTIAL_CACHE_ENABLED,
+    TEX_CACHE_ENABLED,
+    TEX_PREWARM_FILE,
+    MEDIA_CACHE_GC_INTERVAL,
+    WORKSPACE_GC_INTERVAL,
+    WORKSPACE_QUOTA_MB,
+    PARALLEL_RENDER_ENABLED,
+    PARALLEL_RENDER_MIN_ANIMATIONS,
+    PARALLEL_RENDER_MAX_SPLITS,
+    PARALLEL_RENDER_MAX_PENDING,
+    RELIABLE_QUEUE,
+    HEARTBEAT_INTERVAL,
+    REAPER_INTERVAL
 )
-from config import MEDIA_DIR, NUM_WORKERS
 
 
 logging.basicConfig(
@@ -27,176 +80,570 @@ logging.basicConfig(
 
 logger = logging.getLogger("manim-worker")
 
+renderer_pool = None
+
+
+def report_progress(task_id, progress):
+    try:
+        queue.update_task_progress(task_id, progress)
+    except Exception as e:
+        logger.warning(f"Failed to report progress for task {task_id}: {str(e)}")
+
+
+def fail_task(task_id, error_message, webhook_url):
+    logger.error(error_message)
+    queue.update_task_status(task_id, TaskStatus.FAILED, error=error_message)
+    metrics.count("tasks_failed")
+    notify_task_completion(
+        task_id=task_id,
+        status="failed",
+        error=error_message,
+        webhook_url=webhook_url
+    )
+
+
+def complete_task(task_id, result, webhook_url):
+    queue.update_task_status(task_id, TaskStatus.COMPLETED, result=result)
+    metrics.count("tasks_completed")
+    notify_task_completion(
+        task_id=task_id,
+        status="completed",
+        result=result,
+        webhook_url=webhook_url
+    )
+
+
+def render_scenes(task_id, workspace, code, scene_names, quality, last_frame=False, timeout=None, on_progress=None,
+                  cache_scope=None):
+    """Render one or more scenes of the same code with the renderer pool or the manim CLI.
+    
+    All scenes render in one renderer request or one manim invocation, so the
+    code is imported once. Video renders share a partial-movie directory per
+    cache scope (the tenant, or else the code itself), scene class and
+    quality, so re-rendering an edited scene only renders the animations that
+    changed. Renders of the same scene in the same scope hold its directory
+    lock, since manim rewrites the partial movie list in place; common scene
+    names like MainScene don't serialize unrelated tenants. Without a
+    timeout from the task's pre-flight estimate, each scene gets RENDER_TIMEOUT.
+    Everything else the render writes stays in the task's workspace.
+    
+    Returns (success, {scene name: path of the video or last frame}, or an error message).
+    """
+    partial_cache = (
+        PARTIAL_CACHE_ENABLED and not last_frame
+        and all(scene_name.isidentifier() for scene_name in scene_names)
+    )
+    # Sorted so two batches sharing scene names can't deadlock
+    scope = cache_scope or code
+    partial_dirs = sorted({partial_movie_dir(quality, scope, name) for name in scene_names}) if partial_cache else []
+    
+    with ExitStack() as locks:
+        for partial_dir in partial_dirs:
+            locks.enter_context(locked_dir(partial_dir))
+        
+        cache_options = manim_cache_options(quality if partial_cache else None, scope)
+        success, result_or_error = run_render(
+            task_id, workspace, code, scene_names, quality, last_frame, cache_options, timeout,
+            on_progress=on_progress
+        )
+        
+        if success:
+            for partial_dir in partial_dirs:
+                touch_used_partials(partial_dir)
+    return success, result_or_error
+
+
+def render_scene(task_id, workspace, code, scene_name, quality, last_frame=False, timeout=None, on_progress=None,
+                 cache_scope=None):
+    """Render a single scene; returns (success, output path or error message)."""
+    success, result_or_error = render_scenes(
+        task_id, workspace, code, [scene_name], quality, last_frame, timeout, on_progress, cache_scope
+    )
+    if not success:
+        return False, result_or_error
+    return True, result_or_error[scene_name]
+
+
+def parallel_splits(task):
+    """Number of animation ranges to render the task's scene in; 1 renders it whole.
+    
+    Only scenes whose animations the pre-flight analysis counted exactly are
+    split, and only while no more than PARALLEL_RENDER_MAX_PENDING tasks wait
+    for the cores the extra renders would take. Splits are sized from the
+    host's CPUs, not this process's: a supervised worker is pinned to one
+    slice, and its ranges run outside it.
+    """
+    if not PARALLEL_RENDER_ENABLED or not task.animations:
+        return 1
+    
+    splits = min(PARALLEL_RENDER_MAX_SPLITS or host_render_slots(),
+                 task.animations // PARALLEL_RENDER_MIN_ANIMATIONS)
+    if splits < 2 or queue.pending_count() > PARALLEL_RENDER_MAX_PENDING:
+        return 1
+    return splits
+
+
+def render_scene_parallel(task_id, workspace, code, scene_name, quality, animations, splits, timeout=None):
+    """Render a scene as animation ranges in separate processes and join the videos losslessly.
+    
+    Every range runs all of construct() but only renders frames for its own
+    animations, like manim's -n start,end. The last range is open-ended in
+    case the static count came up short, and a range past the real end
+    renders nothing and is left out. The shared partial-movie cache isn't
+    used, since the ranges would rewrite the same partial movie list at once.
+    Ranges render as CLI processes free to run on any host CPU, since the
+    renderer pool may hold fewer renderers than ranges (one per supervised
+    worker process) and that process's CPU slice would serialize them.
+    
+    Returns (success, video path or error message).
+    """
+    size = math.ceil(animations / splits)
+    ranges = [(start, start + size - 1) for start in range(0, animations, size)]
+    ranges[-1] = (ranges[-1][0], None)
+    
+    def render_range(bounds):
+        start, end = bounds
+        options = manim_cache_options()
+        if start:
+            options["from_animation_number"] = start
+        if end is not None:
+            options["upto_animation_number"] = end
+        return run_render(
+            task_id, workspace, code, [scene_name], quality, False, options, timeout, allow_missing=True,
+            cpus=HOST_CPUS
+        )
+    
+    with ThreadPoolExecutor(max_workers=len(ranges), thread_name_prefix=f"range-{task_id}") as executor:
+        results = list(executor.map(render_range, ranges))
+    
+    parts = []
+    for success, result_or_error in results:
+        if not success:
+            return False, result_or_error
+        part = result_or_error.get(scene_name)
+        if part and os.path.exists(part):
+            parts.append(part)
+    if not parts:
+        return False, f"Video file for {scene_name} not found after successful rendering"
+    
+    output_path = os.path.join(workspace.media_dir, "videos", "parallel", QUALITY_DIRS[quality], f"{scene_name}.mp4")
+    with metrics.timed("concat", task_id):
+        success, result_or_error = concat_videos(parts, output_path)
+    cleanup_files(parts)
+    return success, result_or_error
+
+
+def run_render(task_id, workspace, code, scene_names, quality, last_frame, cache_options, timeout=None,
+               allow_missing=False, on_progress=None, cpus=None):
+    """Render in the renderer pool or with the manim CLI, into the task's workspace.
+    
+    Raises WorkspaceError once the workspace holds more than its quota, or
+    when a CLI render is stopped for writing a file larger than the whole
+    quota. With allow_missing, scenes that produced no video are left out of
+    the result instead of failing the render. on_progress replaces the
+    default progress reporting of pooled renders. With cpus, the render
+    skips the pool and runs as a CLI process on those CPUs.
+    """
+    timeout = timeout or RENDER_TIMEOUT * len(scene_names)
+    
+    if renderer_pool and not cpus:
+        success, result_or_error = renderer_pool.render(
+            code,
+            scene_names,
+            media_dir=workspace.media_dir,
+            quality=quality,
+            timeout=timeout,
+            last_frame=last_frame,
+            on_progress=on_progress or (lambda progress: report_progress(task_id, progress)),
+            config=cache_options
+        )
+        if not success:
+            return False, f"Manim failed:\n{result_or_error}"
+        workspace.check_quota()
+        return True, result_or_error
+    
+    try:
+        with metrics.timed("temp_file_write", task_id):
+            file_path = workspace.write_code(code)
+    except Exception as e:
+        return False, f"Failed to create temporary file: {str(e)}"
+    
+    options = ["-s"] if last_frame else []
+    if cache_options:
+        options += ["--config_file", write_cli_config(f"{os.path.splitext(file_path)[0]}.cfg", cache_options)]
+    
+    with metrics.timed("manim_cli", task_id):
+        result = subprocess.run(
+            cli_command(f"-q{quality}", "--media_dir", workspace.media_dir, *options, file_path, *scene_names),
+            cwd=workspace.path,
+            env=cli_env(cpus),
+            capture_output=True,
+            text=True,
+            timeout=timeout
+        )
+    
+    if result.returncode == -signal.SIGXFSZ:
+        raise WorkspaceError(f"Render wrote a file over the {WORKSPACE_QUOTA_MB} MB quota")
+    if result.returncode != 0:
+        return False, f"Manim failed:\nSTDERR: {result.stderr}\nSTDOUT: {result.stdout}"
+    workspace.check_quota()
+    
+    module_name = os.path.basename(file_path).split('.')[0]
+    outputs = {}
+    for scene_name in scene_names:
+        if last_frame:
+            images = sorted(glob.glob(os.path.join(workspace.media_dir, "images", module_name, f"{scene_name}*.png")))
+            output_path = images[-1] if images else ""
+        else:
+            output_path = os.path.join(
+                workspace.media_dir, "videos", module_name, QUALITY_DIRS[quality], f"{scene_name}.mp4"
+            )
+        
+        if not os.path.exists(output_path):
+            if allow_missing:
+                continue
+            return False, f"Video file for {scene_name} not found after successful rendering"
+        outputs[scene_name] = output_path
+    
+    return True, outputs
+
+
+def upload_output(task_id, output_path, store=artifact_store):
+    with metrics.timed("s3_upload", task_id):
+        if output_path.endswith(".png"):
+            return store.put(output_path, content_type="image/png")
+        return store.put_video(output_path)
+
+
+def process_preview(task, workspace, scene_name):
+    """Render the quick preview pass and queue the requested quality behind it."""
+    success, result_or_error = render_scene(
+        task.id, workspace, task.code, scene_name, PREVIEW_QUALITY, last_frame=PREVIEW_LAST_FRAME, timeout=task.timeout,
+        cache_scope=task.tenant
+    )
+    if not success:
+        fail_task(task.id, result_or_error, task.webhook_url)
+        return
+    
+    success, result_or_error = upload_output(task.id, result_or_error, preview_store)
+    if not success:
+        fail_task(task.id, result_or_error, task.webhook_url)
+        return
+    logger.info(f"Preview uploaded to {result_or_error}")
+    
+    result = {"preview_url": result_or_error}
+    if PREVIEW_LAST_FRAME or task.quality != PREVIEW_QUALITY:
+        result["full_task_id"] = queue.enqueue_task(
+            code=task.code,
+            scene_name=scene_name,
+            priority=TaskPriority.BATCH,
+            tenant=task.tenant,
+            quality=task.quality,
+            parent_id=task.id
+        )
+        full_task = queue.get_task(result["full_task_id"])
+        if full_task and full_task.status == TaskStatus.COMPLETED:
+            # The full render was already cached, so the child completed on enqueue
+            result["video_url"] = full_task.result["video_url"]
+    else:
+        result["video_url"] = result_or_error
+    
+    complete_task(task.id, result, task.webhook_url)
+
+
+def process_hls(task, workspace, scene_name):
+    """Render a scene as HLS, publishing a segment as each animation finishes.
+    
+    Only pooled renders report finished animations; a CLI render is segmented
+    once it is done, which gives the same playlist without the early start.
+    """
+    quality = task.quality or RENDER_QUALITY
+    stream = HlsStream(task.id, quality, workspace.scratch_dir("hls"), task.encoder_preset)
+    
+    def on_progress(progress):
+        if progress.get("partial_movie_file"):
+            stream.add(progress["partial_movie_file"])
+        report_progress(task.id, {**progress, "playlist_url": stream.playlist_url if stream.ready else None})
+    
+    try:
+        success, result_or_error = render_scene(
+            task.id, workspace, task.code, scene_name, quality, timeout=task.timeout, on_progress=on_progress,
+            cache_scope=task.tenant
+        )
+        if success:
+            if not stream.videos_added:
+                stream.add(result_or_error)
+            success, result_or_error = stream.finish()
+    finally:
+        stream.close()
+    
+    if not success:
+        fail_task(task.id, result_or_error, task.webhook_url)
+        return
+    logger.info(f"Playlist published at {result_or_error}")
+    
+    if task.cache_key:
+        queue.cache.put(task.cache_key, {"playlist_url": result_or_error})
+    
+    complete_task(task.id, {"playlist_url": result_or_error}, task.webhook_url)
+
+
+def process_scenes(task, workspace):
+    """Render every scene of a batch item in one go and upload each video."""
+    quality = task.quality or RENDER_QUALITY
+    
+    success, result_or_error = render_scenes(
+        task.id, workspace, task.code, task.scene_names, quality, timeout=task.timeout, cache_scope=task.tenant
+    )
+    if not success:
+        fail_task(task.id, result_or_error, task.webhook_url)
+        return
+    
+    videos = {}
+    for scene_name, video_path in result_or_error.items():
+        success, url_or_error = upload_output(task.id, video_path)
+        if not success:
+            fail_task(task.id, url_or_error, task.webhook_url)
+            return
+        videos[scene_name] = url_or_error
+    logger.info(f"Uploaded {len(videos)} scenes for task {task.id}")
+    
+    if task.cache_key:
+        queue.cache.put(task.cache_key, {"videos": videos})
+    
+    complete_task(task.id, {"videos": videos}, task.webhook_url)
+
+
+def update_parent(task, fields):
+    """Attach the outcome of a preview's full-quality pass to the preview task and notify it."""
+    parent_result = queue.merge_task_result(task.parent_id, fields)
+    parent = queue.get_task(task.parent_id)
+    if parent_result is not None and parent:
+        notify_task_completion(
+            task_id=task.parent_id,
+            status="completed",
+            result=parent_result,
+            webhook_url=parent.webhook_url
+        )
+
 
 def process_task(task):
+    if task.created_at:
+        metrics.observe("queue_wait", time.time() - task.created_at)
+    
+    start = time.perf_counter()
+    with metrics.timed("task_total", task.id):
+        try:
+            with task_workspace(task.id) as workspace:
+                run_task(task, workspace)
+        except WorkspaceError as e:
+            fail_task(task.id, str(e), task.webhook_url)
+    
+    if task.parent_id:
+        # However the full-quality pass ended (rendered, served from the cache
+        # or failed), it ends the preview task's wait for its video
+        try:
+            current = queue.get_task(task.id)
+            if current and current.status == TaskStatus.COMPLETED and (current.result or {}).get("video_url"):
+                update_parent(task, {"video_url": current.result["video_url"]})
+            elif current and current.status == TaskStatus.FAILED:
+                update_parent(task, {"video_error": current.error})
+        except Exception as e:
+            logger.warning(f"Failed to update parent of task {task.id}: {str(e)}")
+    
+    try:
+        queue.record_service_time(time.perf_counter() - start)
+    except Exception as e:
+        logger.warning(f"Failed to record service time: {str(e)}")
+
+
+def run_task(task, workspace):
     task_id = task.id
     code = task.code
     scene_name = task.scene_name
     webhook_url = task.webhook_url
-    file_path = None
-    video_path = None
+    quality = task.quality or RENDER_QUALITY
 
     try:
         logger.info(f"Starting Manim rendering task {task_id}")
         
-        queue.update_task_status(task_id,TaskStatus.PROCESSING)
-        
-        if not scene_name:
+        if not scene_name and not task.scene_names:
             scene_name = extract_scene_name(code)
             if not scene_name:
-                error_msg = "Could not determine scene name. Ensure code defines a Scene class."
-                logger.error(error_msg)
-                queue.update_task_status(task_id, TaskStatus.FAILED, error=error_msg)
-                notify_task_completion(
-                    task_id=task_id,
-                    status="failed",
-                    error=error_msg,
-                    webhook_url=webhook_url
-                )
+                fail_task(task_id, "Could not determine scene name. Ensure code defines a Scene class.", webhook_url)
                 return
-        try:
-            file_path = create_temp_file(code)
-            logger.info(f"Created temporary file at {file_path}")
-            
-            # Verify file exists before proceeding
-            if not os.path.exists(file_path):
-                raise FileNotFoundError(f"File was created but doesn't exist at {file_path}")
-                
-        except Exception as e:
-            error_msg = f"Failed to create temporary file: {str(e)}"
-            logger.error(error_msg)
-            queue.update_task_status(task_id, TaskStatus.FAILED, error=error_msg)
-            notify_task_completion(
-                task_id=task_id,
-                status="failed",
-                error=error_msg,
-                webhook_url=webhook_url
-            )
-            return
-        # file_path = create_temp_file(code)
-        # logger.info(f"Created temporary file at {file_path}")
-        
-        # logger.info(f"Running Manim for scene: {scene_name}")
         
+        if task.cache_key:
+            cached = queue.cache.peek(task.cache_key)
+            if cached:
+                # A duplicate of this scene finished while the task was queued
+                logger.info(f"Render cache hit for task {task_id}")
+                complete_task(task_id, {**cached, "cached": True}, webhook_url)
+                return
         
-        result = subprocess.run(
-            ["manim", "-ql", file_path, scene_name],
-            capture_output=True,
-            text=True,
-            timeout=180 
-        )
+        if task.scene_names:
+            process_scenes(task, workspace)
+            return
         
-        if result.returncode != 0:
-            error_message = f"Manim failed:\nSTDERR: {result.stderr}\nSTDOUT: {result.stdout}"
-            logger.error(error_message)
-            queue.update_task_status(task_id, TaskStatus.FAILED, error=error_message)
-            notify_task_completion(
-                task_id=task_id,
-                status="failed",
-                error=error_message,
-                webhook_url=webhook_url
-            )
+        if task.output == OutputFormat.HLS:
+            process_hls(task, workspace, scene_name)
             return
         
-        video_file = f"{scene_name}.mp4"
-        video_path = os.path.join(MEDIA_DIR, "videos", os.path.basename(file_path).split('.')[0], "480p15", video_file)
-        if not os.path.exists(video_path):
-            # Try alternative path
-            video_path = os.path.join("media", "videos", "main", "480p15", video_file)
-            
+        if task.preview:
+            process_preview(task, workspace, scene_name)
+            return
         
-        if not os.path.exists(video_path):
-            error_message = f"Video file not found after successful rendering"
-            logger.error(error_message)
-            queue.update_task_status(task_id, TaskStatus.FAILED, error=error_message)
-            notify_task_completion(
-                task_id=task_id,
-                status="failed",
-                error=error_message,
-                webhook_url=webhook_url
+        splits = parallel_splits(task)
+        if splits > 1:
+            logger.info(f"Rendering task {task_id} as {splits} animation ranges")
+            success, result_or_error = render_scene_parallel(
+                task_id, workspace, code, scene_name, quality, task.animations, splits, timeout=task.timeout
+            )
+        else:
+            success, result_or_error = render_scene(
+                task_id, workspace, code, scene_name, quality, timeout=task.timeout, cache_scope=task.tenant
             )
+        if not success:
+            fail_task(task_id, result_or_error, webhook_url)
             return
+        video_path = result_or_error
         
         logger.info(f"Video generated at {video_path}")
         
-        success, result_or_error = upload_to_s3(video_path)
+        success, result_or_error = upload_output(task_id, video_path)
         if not success:
-            logger.error(result_or_error)
-            queue.update_task_status(task_id, TaskStatus.FAILED, error=result_or_error)
-            notify_task_completion(
-                task_id=task_id,
-                status="failed",
-                error=result_or_error,
-                webhook_url=webhook_url
-            )
+            fail_task(task_id, result_or_error, webhook_url)
             return
         logger.info(f"Video uploaded to {result_or_error}")
         
-        # Update task status and result
-        queue.update_task_status(
-            task_id, 
-            TaskStatus.COMPLETED, 
-            result={"video_url": result_or_error}
-        )
+        if task.cache_key:
+            queue.cache.put(task.cache_key, {"video_url": result_or_error})
         
-        # Send webhook notification if configured
-        notify_task_completion(
-            task_id=task_id,
-            status="completed",
-            result={"video_url": result_or_error},
-            webhook_url=webhook_url
-        )
+        # Update task status and result, and send webhook notification if configured
+        complete_task(task_id, {"video_url": result_or_error}, webhook_url)
         
+    except (subprocess.TimeoutExpired, TimeoutError):
+        fail_task(task_id, "Manim execution timed out", webhook_url)
         
-    except subprocess.TimeoutExpired:
-        error_msg = "Manim execution timed out"
-        logger.error(error_msg)
-        queue.update_task_status(task_id, TaskStatus.FAILED, error=error_msg)
-        notify_task_completion(
-            task_id=task_id, 
-            status="failed", 
-            error=error_msg,
-            webhook_url=webhook_url
-        )
+    except WorkspaceError as e:
+        fail_task(task_id, str(e), webhook_url)
         
     except Exception as e:
-        error_msg = f"Unexpected error: {str(e)}"
-        logger.error(error_msg)
         logger.error(traceback.format_exc())
-        queue.update_task_status(task_id, TaskStatus.FAILED, error=error_msg)
-        notify_task_completion(
-            task_id=task_id, 
-            status="failed", 
-            error=error_msg,
-            webhook_url=webhook_url
-        )
-        
-    # finally:
-    #     # Clean up files
-    #     cleanup_files([file_path, video_path])
+        fail_task(task_id, f"Unexpected error: {str(e)}", webhook_url)
 
 
+class TaskHeartbeat:
+    """Keeps a claimed task's visibility timeout from lapsing while it renders."""
+    
+    def __init__(self, worker_id, task_id):
+        self.worker_id = worker_id
+        self.task_id = task_id
+        self.stopped = Event()
+        self.thread = Thread(target=self._run, name=f"heartbeat-{task_id}", daemon=True)
+    
+    def _run(self):
+        while not self.stopped.wait(HEARTBEAT_INTERVAL):
+            try:
+                queue.heartbeat(self.worker_id, self.task_id)
+            except Exception as e:
+                logger.warning(f"Heartbeat for task {self.task_id} failed: {str(e)}")
+    
+    def __enter__(self):
+        self.thread.start()
+        return self
+    
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
 
 
+def reaper_loop():
+    while True:
+        time.sleep(REAPER_INTERVAL)
+        try:
+            queue.repair_signals()
+            queue.prune_task_index()
+            metrics.prune_workers()
+            if not RELIABLE_QUEUE:
+                continue
+            reaped = queue.reap_stalled_tasks()
+            if reaped:
+                logger.warning(f"Recovered {reaped} stalled tasks")
+        except Exception as e:
+            logger.error(f"Error in reaper loop: {str(e)}")
 
 
+def local_stores():
+    return [store for store in {artifact_store, preview_store} if isinstance(store, LocalStore)]
+
+
+def media_cache_gc_loop():
+    while True:
+        time.sleep(MEDIA_CACHE_GC_INTERVAL)
+        try:
+            prune_media_caches()
+            for store in local_stores():
+                store.prune()
+        except Exception as e:
+            logger.error(f"Error pruning media cache: {str(e)}")
+
+
+def workspace_gc_loop():
+    while True:
+        time.sleep(WORKSPACE_GC_INTERVAL)
+        try:
+            collect_garbage()
+        except Exception as e:
+            logger.error(f"Error collecting workspaces: {str(e)}")
+
+
+def backoff_delay(failures):
+    """Exponential backoff with full jitter, so workers don't retry Redis in lockstep."""
+    return random.uniform(0, min(WORKER_BACKOFF_MAX, WORKER_BACKOFF_BASE * 2 ** min(failures, 16)))
 
 
 def worker_loop():
+    worker_id = f"{socket.gethostname()}-{os.getpid()}-{current_thread().name}"
+    failures = 0
+    
     while True:
         try:
-            task = queue.wait_for_task()
+            metrics.worker_state(worker_id, busy=False)
+            
+            if RELIABLE_QUEUE:
+                # Wake up periodically so the worker heartbeat stays fresh while idle
+                task = queue.claim_task(worker_id, timeout=HEARTBEAT_INTERVAL)
+                if task:
+                    metrics.worker_state(worker_id, busy=True)
+                    with TaskHeartbeat(worker_id, task.id):
+                        process_task(task)
+                    queue.ack_task(worker_id, task.id)
+                failures = 0
+                continue
+            
+            # Also wakes up periodically, so the worker reports itself alive while idle
+            task = queue.wait_for_task(timeout=HEARTBEAT_INTERVAL)
             
             if task:
+                metrics.worker_state(worker_id, busy=True)
                 process_task(task)
+            failures = 0
             
         except Exception as e:
             logger.error(f"Error in worker loop: {str(e)}")
             logger.error(traceback.format_exc())
             
-            time.sleep(1)
+            time.sleep(backoff_delay(failures))
+            failures += 1
             
 def start_workers(num_workers):
+    global renderer_pool
+    
+    if RENDERER_POOL_ENABLED:
+        logger.info(f"Starting renderer pool with {num_workers} renderers")
+        renderer_pool = RendererPool(num_workers)
+    
     logger.info(f"Starting {num_workers} worker threads")
     
     for i in range(num_workers):
@@ -206,20 +653,79 @@ def start_workers(num_workers):
             daemon=True
         )
         worker_thread.start()
+    
+    Thread(target=reaper_loop, name="reaper", daemon=True).start()
+    Thread(target=workspace_gc_loop, name="workspace-gc", daemon=True).start()
+    
+    if PARTIAL_CACHE_ENABLED or TEX_CACHE_ENABLED or local_stores():
+        Thread(target=media_cache_gc_loop, name="media-cache-gc", daemon=True).start()
+
+
+def worker_process_main(index, cpus):
+    """Entry point of a supervised worker process bound to its own CPU slice."""
+    pin_render_threads(cpus)
+    start_workers(1)
+    
+    while True:
+        time.sleep(60)
+
+
+def supervise(num_processes):
+    """Run one single-threaded worker process per CPU slice and restart any that die."""
+    ctx = multiprocessing.get_context("spawn")
+    
+    def spawn(index):
+        process = ctx.Process(
+            target=worker_process_main,
+            args=(index, cpu_slice(index)),
+            name=f"worker-process-{index}"
+        )
+        process.start()
+        return process
+    
+    logger.info(f"Supervising {num_processes} worker processes")
+    processes = {i: spawn(i) for i in range(num_processes)}
+    
+    try:
+        while True:
+            time.sleep(1)
+            for index, process in processes.items():
+                if not process.is_alive():
+                    logger.warning(f"Worker process {index} exited with code {process.exitcode}, restarting")
+                    processes[index] = spawn(index)
+    except KeyboardInterrupt:
+        logger.info("Shutting down worker processes...")
+        for process in processes.values():
+            process.terminate()
+        for process in processes.values():
+            process.join()
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Manim rendering worker")
     parser.add_argument("--workers", type=int, default=NUM_WORKERS,
                         help="Number of worker threads to start")
+    parser.add_argument("--supervise", action="store_true",
+                        help="Run one worker process per CPU slice instead of threads")
+    parser.add_argument("--processes", type=int, default=WORKER_PROCESSES,
+                        help="Number of worker processes in supervisor mode (0 sizes to the CPU count)")
     args = parser.parse_args()
     
-    os.makedirs("temp", exist_ok=True)
+    if TEX_CACHE_ENABLED and TEX_PREWARM_FILE:
+        # Once per host, before any worker competes for the same formulas
+        prewarm_tex_cache(TEX_PREWARM_FILE)
+    
+    if args.supervise:
+        supervise(args.processes or default_worker_processes())
+        raise SystemExit(0)
     
+    pin_render_threads()
     start_workers(args.workers)
     
     try:
         while True:
             time.sleep(60)
     except KeyboardInterrupt:
-        logger.info("Shutting down workers...")
\ No newline at end of file
+        logger.info("Shutting down workers...")
+        if renderer_pool:
+            renderer_pool.close()
\ No newline at end of file
@@ -0,0 +1,150 @@
+import os
+import time
+import uuid
+import shutil
+import logging
+from contextlib import contextmanager
+from typing import Iterator, List, Tuple
+
+from .config import (
+    WORKSPACE_ROOTS,
+    WORKSPACE_MIN_FREE_MB,
+    WORKSPACE_QUOTA_MB,
+    WORKSPACE_MAX_TOTAL_MB,
+    WORKSPACE_GC_MIN_AGE,
+    WORKSPACE_MAX_AGE
+)
+from .media_cache import locked_dir
+
+
+logger = logging.getLogger("manim-workspace")
+
+
+class WorkspaceError(Exception):
+    """No workspace root has room for a task, or a task went over its quota."""
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for directory, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(directory, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def _free_mb(root: str) -> float:
+    return shutil.disk_usage(root).free / (1024 * 1024)
+
+
+class Workspace:
+    """A task's private directory for its code files, media output and scratch files."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.media_dir = os.path.join(path, "media")
+        os.makedirs(self.media_dir, exist_ok=True)
+
+    def write_code(self, code: str) -> str:
+        """Write the code to a uniquely named module file; returns its path."""
+        file_path = os.path.join(self.path, f"{uuid.uuid4().hex}.py")
+        with open(file_path, "w") as f:
+            f.write(code)
+        return file_path
+
+    def scratch_dir(self, name: str) -> str:
+        path = os.path.join(self.path, name)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def check_quota(self) -> None:
+        if not WORKSPACE_QUOTA_MB:
+            return
+        used_mb = _dir_size(self.path) / (1024 * 1024)
+        if used_mb > WORKSPACE_QUOTA_MB:
+            raise WorkspaceError(f"Render used {used_mb:.0f} MB of disk, over the {WORKSPACE_QUOTA_MB} MB quota")
+
+
+def pick_root() -> str:
+    """First of WORKSPACE_ROOTS with WORKSPACE_MIN_FREE_MB free, e.g. a tmpfs before the disk."""
+    for root in WORKSPACE_ROOTS:
+        os.makedirs(root, exist_ok=True)
+        if _free_mb(root) >= WORKSPACE_MIN_FREE_MB:
+            return root
+    raise WorkspaceError(f"No workspace root has {WORKSPACE_MIN_FREE_MB} MB free")
+
+
+@contextmanager
+def task_workspace(task_id: str) -> Iterator[Workspace]:
+    """An isolated workspace for one run of a task, removed when the run ends.
+
+    The directory is locked while in use, so the garbage collector only
+    removes workspaces whose worker died before cleaning up. A retried task
+    gets a fresh directory, in case the earlier attempt is still running.
+    """
+    path = os.path.join(pick_root(), f"{task_id}-{uuid.uuid4().hex[:8]}")
+    with locked_dir(path):
+        try:
+            yield Workspace(path)
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _workspaces(root: str) -> List[Tuple[float, str]]:
+    """(mtime, path) of each workspace under root, oldest first, skipping any removed meanwhile."""
+    workspaces = []
+    try:
+        entries = list(os.scandir(root))
+    except FileNotFoundError:
+        return []
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                workspaces.append((entry.stat().st_mtime, entry.path))
+        except FileNotFoundError:
+            continue  # its task finished between the scan and the stat
+    return sorted(workspaces)
+
+
+def collect_garbage() -> int:
+    """Remove abandoned workspaces; returns how many were removed.
+
+    Unlocked workspaces go once they are WORKSPACE_MAX_AGE old, or oldest
+    first while a root holds more than WORKSPACE_MAX_TOTAL_MB. Workspaces
+    younger than WORKSPACE_GC_MIN_AGE are left alone, as they may not be
+    locked yet.
+    """
+    removed = 0
+    now = time.time()
+    for root in WORKSPACE_ROOTS:
+        workspaces = _workspaces(root)
+        sizes = {path: _dir_size(path) for _, path in workspaces}
+        total = sum(sizes.values())
+
+        for mtime, path in workspaces:
+            age = now - mtime
+            over_size = WORKSPACE_MAX_TOTAL_MB and total > WORKSPACE_MAX_TOTAL_MB * 1024 * 1024
+            if age < WORKSPACE_GC_MIN_AGE or not (over_size or age > WORKSPACE_MAX_AGE):
+                continue
+
+            if not os.path.isdir(path):
+                total -= sizes[path]  # its task finished meanwhile
+                continue
+            try:
+                with locked_dir(path, blocking=False) as acquired:
+                    if not acquired:
+                        continue
+                    shutil.rmtree(path, ignore_errors=True)
+            except FileNotFoundError:
+                pass
+            total -= sizes[path]
+            removed += 1
+
+        if WORKSPACE_MAX_TOTAL_MB and total > WORKSPACE_MAX_TOTAL_MB * 1024 * 1024:
+            logger.warning(f"Workspaces in use under {root} hold {total // (1024 * 1024)} MB")
+
+    if removed:
+        logger.info(f"Removed {removed} abandoned workspaces")
+    return removed
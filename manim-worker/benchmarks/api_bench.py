@@ -0,0 +1,152 @@
+"""Measure requests/sec and latency percentiles of the render API.
+
+Runs a fixed number of keep-alive client threads against a running API
+(`uvicorn app.main:app`) and reports throughput and p50/p95/p99 latency for
+`POST /api/render` and `GET /api/task/{task_id}`. Run it against the same
+deployment before and after a change to compare.
+
+    CLIENT_RATE_LIMIT=0 MAX_QUEUE_DEPTH=0 uvicorn app.main:app
+    python benchmarks/api_bench.py --url http://localhost:8000 --concurrency 64 --duration 30
+
+All clients share one address, so start the API without admission limits
+as above; otherwise most enqueues measure the 429 path. Rejected enqueues
+are counted separately and reported as a warning.
+"""
+import json
+import time
+import uuid
+import argparse
+import threading
+import http.client
+from urllib.parse import urlparse
+from typing import List, Dict
+
+
+SCENE = """from manim import *
+
+class BenchScene(Scene):
+    def construct(self):
+        self.play(Create(Square()))
+
+BENCH_NONCE = "{nonce}"
+"""
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def report(name: str, latencies: List[float], errors: int, duration: float) -> Dict[str, float]:
+    stats = {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / duration,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+    print(
+        f"{name:<24} {stats['requests']:>8} req  {stats['rps']:>9.1f} req/s  "
+        f"p50 {stats['p50_ms']:>7.1f} ms  p95 {stats['p95_ms']:>7.1f} ms  "
+        f"p99 {stats['p99_ms']:>7.1f} ms  errors {errors}"
+    )
+    return stats
+
+
+def client(url: str, deadline: float, unique: bool, results: Dict[str, list], lock: threading.Lock) -> None:
+    parsed = urlparse(url)
+    conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=30)
+    render_latencies, status_latencies = [], []
+    errors = {"render": 0, "status": 0, "rejected": 0}
+    task_ids: List[str] = []
+
+    while time.monotonic() < deadline:
+        # A unique assignment keeps the render cache from answering every enqueue;
+        # a comment would not do, since cache keys come from the normalized AST
+        code = SCENE.format(nonce=uuid.uuid4().hex if unique else "")
+        body = json.dumps({"code": code})
+
+        start = time.perf_counter()
+        try:
+            conn.request("POST", "/api/render", body, {"Content-Type": "application/json"})
+            response = conn.getresponse()
+            payload = response.read()
+            render_latencies.append(time.perf_counter() - start)
+            if response.status == 200:
+                task_ids.append(json.loads(payload)["task_id"])
+            elif response.status == 429:
+                errors["rejected"] += 1
+            else:
+                errors["render"] += 1
+        except (OSError, http.client.HTTPException):
+            errors["render"] += 1
+            conn.close()
+
+        if not task_ids:
+            continue
+
+        start = time.perf_counter()
+        try:
+            conn.request("GET", f"/api/task/{task_ids[-1]}")
+            response = conn.getresponse()
+            response.read()
+            status_latencies.append(time.perf_counter() - start)
+            if response.status != 200:
+                errors["status"] += 1
+        except (OSError, http.client.HTTPException):
+            errors["status"] += 1
+            conn.close()
+
+    with lock:
+        results["render"].extend(render_latencies)
+        results["status"].extend(status_latencies)
+        results["render_errors"].append(errors["render"])
+        results["status_errors"].append(errors["status"])
+        results["rejected"].append(errors["rejected"])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Render API throughput benchmark")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--cached", action="store_true",
+                        help="Submit identical code so enqueues hit the render cache")
+    parser.add_argument("--json", dest="json_path", help="Write the results to this file")
+    args = parser.parse_args()
+
+    results: Dict[str, list] = {"render": [], "status": [], "render_errors": [], "status_errors": [], "rejected": []}
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.duration
+
+    threads = [
+        threading.Thread(target=client, args=(args.url, deadline, not args.cached, results, lock))
+        for _ in range(args.concurrency)
+    ]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    print(f"{args.concurrency} clients for {elapsed:.1f}s against {args.url}")
+    summary = {
+        "render": report("POST /api/render", results["render"], sum(results["render_errors"]), elapsed),
+        "status": report("GET /api/task/{id}", results["status"], sum(results["status_errors"]), elapsed),
+        "rejected": sum(results["rejected"]),
+    }
+    if summary["rejected"]:
+        print(f"warning: {summary['rejected']} enqueues were rejected with 429; "
+              f"start the API with CLIENT_RATE_LIMIT=0 MAX_QUEUE_DEPTH=0")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
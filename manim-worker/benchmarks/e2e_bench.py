@@ -0,0 +1,272 @@
+"""Replay a corpus of scenes through the whole render pipeline.
+
+Starts the API (`uvicorn app.main:app`) and `python -m app.worker` against a
+local Redis and a local S3 stand-in, submits every scene in
+benchmarks/scenes/ through `POST /api/render`, and waits for each task to
+finish. For every worker count it reports throughput, p50/p95/p99
+end-to-end latency (submit to completed), and the mean time per pipeline
+stage taken from the difference in `/metrics` before and after the run.
+
+    python benchmarks/e2e_bench.py --workers 1,2,4 --repeat 3 --start-s3
+
+Redis must already be running; the benchmark uses its own database
+(--redis-db) and only flushes it with --flush. With --start-s3 a moto server
+stands in for S3; otherwise S3_ENDPOINT_URL and the AWS_* settings are
+taken from the environment. Render, partial-movie and Tex caches are off
+unless --caches is passed, so runs stay comparable. The temp_file_write
+stage shows the cost of handing code to CLI renders; compare --workspace-root
+on a tmpfs against the default.
+"""
+import os
+import re
+import sys
+import json
+import time
+import signal
+import uuid
+import socket
+import argparse
+import subprocess
+import http.client
+from urllib.parse import urlparse
+from typing import List, Dict, Tuple
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scenes")
+STAGE_LINE = re.compile(r'^manim_stage_seconds_(sum|count)\{stage="(\w+)"\} (\S+)$')
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def load_corpus() -> Dict[str, str]:
+    corpus = {}
+    for name in sorted(os.listdir(SCENES_DIR)):
+        if name.endswith(".py"):
+            with open(os.path.join(SCENES_DIR, name)) as f:
+                corpus[name[:-3]] = f.read()
+    return corpus
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def request(url: str, method: str, path: str, body: dict = None) -> Tuple[int, bytes]:
+    parsed = urlparse(url)
+    conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=30)
+    try:
+        conn.request(method, path, json.dumps(body) if body else None, {"Content-Type": "application/json"})
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+def wait_until_up(url: str, path: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if request(url, "GET", path)[0] < 500:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url}{path} did not come up within {timeout}s")
+
+
+def stage_totals(api_url: str) -> Dict[str, Dict[str, float]]:
+    status, body = request(api_url, "GET", "/metrics")
+    totals: Dict[str, Dict[str, float]] = {}
+    if status != 200:
+        return totals
+    for line in body.decode().splitlines():
+        match = STAGE_LINE.match(line)
+        if match:
+            kind, stage, value = match.groups()
+            totals.setdefault(stage, {})[kind] = float(value)
+    return totals
+
+
+def stage_means(before: Dict[str, Dict[str, float]], after: Dict[str, Dict[str, float]]) -> Dict[str, float]:
+    means = {}
+    for stage, values in after.items():
+        count = values.get("count", 0) - before.get(stage, {}).get("count", 0)
+        if count:
+            means[stage] = (values.get("sum", 0) - before.get(stage, {}).get("sum", 0)) / count
+    return means
+
+
+def start_s3(env: Dict[str, str]) -> subprocess.Popen:
+    """Run a moto server and create the bucket the workers upload to."""
+    import boto3
+
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "moto.server", "-p", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    endpoint = f"http://127.0.0.1:{port}"
+    wait_until_up(endpoint, "/")
+
+    env.update({
+        "S3_ENDPOINT_URL": endpoint,
+        "AWS_ACCESS_KEY_ID": "bench",
+        "AWS_SECRET_ACCESS_KEY": "bench",
+        "AWS_REGION": "us-east-1",
+        "AWS_S3_BUCKET_NAME": env.get("AWS_S3_BUCKET_NAME") or "manim-bench",
+    })
+    boto3.client(
+        "s3",
+        endpoint_url=endpoint,
+        aws_access_key_id="bench",
+        aws_secret_access_key="bench",
+        region_name="us-east-1"
+    ).create_bucket(Bucket=env["AWS_S3_BUCKET_NAME"])
+    return process
+
+
+def run(api_url: str, corpus: Dict[str, str], repeat: int, timeout: float) -> Dict[str, object]:
+    submitted: Dict[str, Tuple[str, float]] = {}
+    latencies: Dict[str, List[float]] = {name: [] for name in corpus}
+    failures = 0
+
+    started = time.monotonic()
+    for _ in range(repeat):
+        for name, code in corpus.items():
+            # An extra assignment changes the AST, so the render cache can't answer
+            body = {"code": f"{code}\nBENCH_NONCE = \"{uuid.uuid4().hex}\"\n"}
+            status, payload = request(api_url, "POST", "/api/render", body)
+            if status != 200:
+                failures += 1
+                continue
+            submitted[json.loads(payload)["task_id"]] = (name, time.monotonic())
+
+    deadline = time.monotonic() + timeout
+    while submitted and time.monotonic() < deadline:
+        for task_id in list(submitted):
+            status, payload = request(api_url, "GET", f"/api/task/{task_id}")
+            task_status = json.loads(payload).get("status") if status == 200 else None
+            if task_status not in ("completed", "failed"):
+                continue
+            name, submitted_at = submitted.pop(task_id)
+            if task_status == "completed":
+                latencies[name].append(time.monotonic() - submitted_at)
+            else:
+                failures += 1
+        time.sleep(0.2)
+    elapsed = time.monotonic() - started
+
+    all_latencies = [latency for values in latencies.values() for latency in values]
+    return {
+        "tasks": len(all_latencies),
+        "failures": failures,
+        "timed_out": len(submitted),
+        "elapsed_s": elapsed,
+        "throughput_per_min": len(all_latencies) / elapsed * 60,
+        "p50_s": percentile(all_latencies, 50),
+        "p95_s": percentile(all_latencies, 95),
+        "p99_s": percentile(all_latencies, 99),
+        "scenes": {name: percentile(values, 50) for name, values in latencies.items()},
+    }
+
+
+def report(workers: int, result: Dict[str, object]) -> None:
+    print(
+        f"\n{workers} workers: {result['tasks']} tasks in {result['elapsed_s']:.1f}s  "
+        f"{result['throughput_per_min']:.1f} tasks/min  failures {result['failures']}  "
+        f"timed out {result['timed_out']}"
+    )
+    print(f"  end-to-end   p50 {result['p50_s']:7.2f}s  p95 {result['p95_s']:7.2f}s  p99 {result['p99_s']:7.2f}s")
+    for name, p50 in result["scenes"].items():
+        print(f"  {name:<20} p50 {p50:7.2f}s")
+    for stage, mean in result["stages"].items():
+        print(f"  stage {stage:<16} mean {mean:7.3f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="End-to-end render pipeline benchmark")
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts to compare")
+    parser.add_argument("--repeat", type=int, default=3, help="Times each corpus scene is submitted per run")
+    parser.add_argument("--timeout", type=float, default=900.0, help="Seconds to wait for a run to finish")
+    parser.add_argument("--redis-db", type=int, default=15)
+    parser.add_argument("--flush", action="store_true", help="FLUSHDB the benchmark Redis database before each run")
+    parser.add_argument("--start-s3", action="store_true", help="Start a moto server as the S3 stand-in")
+    parser.add_argument("--caches", action="store_true", help="Keep the render, partial-movie and Tex caches on")
+    parser.add_argument("--workspace-root", help="WORKSPACE_ROOTS for renders, e.g. /dev/shm/manim-workspaces to compare tmpfs")
+    parser.add_argument("--worker-args", default="", help="Extra arguments for app.worker, e.g. --supervise")
+    parser.add_argument("--json", dest="json_path", help="Write the results to this file")
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    # The whole corpus is submitted from one address at once, so admission limits are off
+    env = {
+        **os.environ,
+        "REDIS_DB": str(args.redis_db),
+        "METRICS_ENABLED": "true",
+        "CLIENT_RATE_LIMIT": "0",
+        "MAX_QUEUE_DEPTH": "0",
+    }
+    if args.workspace_root:
+        env["WORKSPACE_ROOTS"] = args.workspace_root
+    if not args.caches:
+        env.update({"RENDER_CACHE_ENABLED": "false", "PARTIAL_CACHE_ENABLED": "false", "TEX_CACHE_ENABLED": "false"})
+
+    processes = []
+    results = {}
+    try:
+        if args.start_s3:
+            processes.append(start_s3(env))
+
+        api_url = f"http://127.0.0.1:{free_port()}"
+        processes.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(urlparse(api_url).port)],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        ))
+        wait_until_up(api_url, "/health")
+
+        for workers in [int(count) for count in args.workers.split(",")]:
+            if args.flush:
+                import redis
+                redis.Redis(
+                    host=env.get("REDIS_HOST", "localhost"),
+                    port=int(env.get("REDIS_PORT", 6379)),
+                    password=env.get("REDIS_PASSWORD"),
+                    db=args.redis_db
+                ).flushdb()
+
+            worker = subprocess.Popen(
+                [sys.executable, "-m", "app.worker", "--workers", str(workers), *args.worker_args.split()],
+                cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                start_new_session=True  # so supervised worker processes stop with it
+            )
+            try:
+                before = stage_totals(api_url)
+                result = run(api_url, corpus, args.repeat, args.timeout)
+                result["stages"] = stage_means(before, stage_totals(api_url))
+            finally:
+                os.killpg(worker.pid, signal.SIGTERM)
+                worker.wait()
+
+            report(workers, result)
+            results[workers] = result
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            process.wait()
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
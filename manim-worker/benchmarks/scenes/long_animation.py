@@ -0,0 +1,12 @@
+from manim import *
+
+
+class LongAnimation(Scene):
+    def construct(self):
+        dots = VGroup(*[Dot(radius=0.05).shift(RIGHT * (i % 10 - 4.5) + UP * (i // 10 - 2)) for i in range(50)])
+        self.play(LaggedStart(*[FadeIn(dot) for dot in dots], lag_ratio=0.05))
+        for _ in range(6):
+            self.play(Rotate(dots, angle=PI / 3), run_time=2)
+            self.play(dots.animate.scale(0.8), run_time=1)
+            self.play(dots.animate.scale(1.25), run_time=1)
+        self.wait(2)
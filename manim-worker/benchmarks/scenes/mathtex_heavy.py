@@ -0,0 +1,19 @@
+from manim import *
+
+
+class MathTexHeavy(Scene):
+    def construct(self):
+        formulas = [
+            r"e^{i\pi} + 1 = 0",
+            r"\int_0^\infty e^{-x^2}\,dx = \frac{\sqrt{\pi}}{2}",
+            r"\sum_{n=1}^\infty \frac{1}{n^2} = \frac{\pi^2}{6}",
+            r"\nabla \cdot \mathbf{E} = \frac{\rho}{\varepsilon_0}",
+            r"f(x) = \sum_{k=0}^\infty \frac{f^{(k)}(a)}{k!}(x-a)^k",
+            r"\det(A - \lambda I) = 0",
+        ]
+        current = MathTex(formulas[0])
+        self.play(Write(current))
+        for formula in formulas[1:]:
+            self.play(TransformMatchingTex(current, target := MathTex(formula)))
+            current = target
+        self.wait()
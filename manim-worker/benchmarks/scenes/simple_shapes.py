@@ -0,0 +1,13 @@
+from manim import *
+
+
+class SimpleShapes(Scene):
+    def construct(self):
+        square = Square(color=BLUE)
+        circle = Circle(color=RED)
+        triangle = Triangle(color=GREEN)
+
+        self.play(Create(square))
+        self.play(Transform(square, circle))
+        self.play(Transform(square, triangle))
+        self.play(FadeOut(square))
@@ -7,6 +7,7 @@ import shutil
 import uuid
 from contextlib import asynccontextmanager
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError
 import re
 from fastapi.middleware.cors import CORSMiddleware
@@ -15,6 +16,17 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+bucket_name = os.getenv('AWS_S3_BUCKET_NAME')
+
+# One client per process: boto3 clients are thread-safe and keep their connection pool
+s3_client = boto3.client(
+    's3',
+    aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+    aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+    region_name=os.getenv('AWS_REGION'),
+    config=Config(max_pool_connections=int(os.getenv('S3_MAX_POOL_CONNECTIONS', 32)))
+)
+
 app = FastAPI()
 
 app.add_middleware(
@@ -95,19 +107,6 @@ async def run_manim(data: ManimCode):
             return JSONResponse({"error": error_message}, status_code=500)
 
 
-        aws_access_key_id = os.getenv('AWS_ACCESS_KEY_ID')
-        aws_secret_access_key = os.getenv('AWS_SECRET_ACCESS_KEY')
-        aws_region = os.getenv('AWS_REGION')
-        bucket_name = os.getenv('AWS_S3_BUCKET_NAME')
-
-
-        s3_client = boto3.client(
-            's3',
-            aws_access_key_id=aws_access_key_id,
-            aws_secret_access_key=aws_secret_access_key,
-            region_name=aws_region
-        )
-
         s3_key = f"videos/{uuid.uuid4().hex}_{video_file}"
         try:
             s3_client.upload_file(